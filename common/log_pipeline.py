@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from datetime import datetime
+
+# Standard LogRecord attributes, used to pick out structured `extra` fields
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_pipeline = None
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """Rotates at the configured time interval or when the file exceeds `max_bytes`."""
+
+    def __init__(self, filename, when="midnight", backup_count=7, max_bytes=10 * 1024 * 1024):
+        super().__init__(filename, when=when, backupCount=backup_count, delay=True)
+        self.max_bytes = max_bytes
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes:
+            # Use the file's size, not our write offset: forked children append to it too
+            if self.stream is not None:
+                size = os.fstat(self.stream.fileno()).st_size
+            elif os.path.exists(self.baseFilename):
+                size = os.path.getsize(self.baseFilename)
+            else:
+                return False
+            if size + len(self.format(record)) + 1 >= self.max_bytes:
+                return True
+        return False
+
+    def check_rollover(self):
+        """Roll over if due, without waiting for this process to emit a record."""
+        record = logging.makeLogRecord({"msg": ""})
+        self.acquire()
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+        finally:
+            self.release()
+
+    def rotation_filename(self, default_name):
+        # Size rollovers can happen several times per interval; keep names unique
+        name = default_name
+        index = 1
+        while os.path.exists(name):
+            name = f"{default_name}.{index}"
+            index += 1
+        return name
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including structured fields passed via `extra`."""
+
+    def format(self, record):
+        data = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+class RateLimitFilter(logging.Filter):
+    """Drops repeats of the same message beyond `burst` per `interval` seconds.
+
+    Messages are keyed by logger, level and text. Suppressed repeats are
+    counted and reported in a summary record once the window closes.
+    """
+
+    def __init__(self, burst=5, interval=60.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.windows = {}
+
+    def filter(self, record):
+        # Summaries emitted by flush() always pass
+        if getattr(record, "suppressed", None) is not None:
+            return True
+
+        key = (record.name, record.levelno, record.getMessage())
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or now - window["start"] >= self.interval:
+                expired = window
+                self.windows[key] = {"start": now, "count": 1, "suppressed": 0, "record": record}
+            else:
+                expired = None
+                window["count"] += 1
+                if window["count"] > self.burst:
+                    window["suppressed"] += 1
+                    return False
+        if expired and expired["suppressed"]:
+            self.emit_summary(expired)
+        return True
+
+    def flush(self):
+        """Report and reset windows that have closed with suppressed repeats."""
+        now = time.monotonic()
+        with self.lock:
+            keys = [k for k, w in self.windows.items() if now - w["start"] >= self.interval]
+            expired = [self.windows.pop(k) for k in keys]
+        for window in expired:
+            if window["suppressed"]:
+                self.emit_summary(window)
+
+    def emit_summary(self, window):
+        record = window["record"]
+        logging.getLogger(record.name).log(
+            record.levelno,
+            f"Suppressed {window['suppressed']} repeats of: {record.getMessage()}",
+            extra={"suppressed": window["suppressed"]}
+        )
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks the caller; drops records when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class LogPipeline:
+    """Root logging setup: rate limiting on the caller side, formatting and I/O on a writer thread."""
+
+    def __init__(self, log_file, level=logging.INFO, max_bytes=10 * 1024 * 1024, backup_count=7,
+                 when="midnight", burst=5, interval=60.0, queue_size=10000, json_log=True):
+        text_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+        handlers = []
+        os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+        file_handler = SizeAndTimeRotatingFileHandler(log_file, when, backup_count, max_bytes)
+        file_handler.setFormatter(text_formatter)
+        handlers.append(file_handler)
+
+        if json_log:
+            json_handler = SizeAndTimeRotatingFileHandler(f"{os.path.splitext(log_file)[0]}.jsonl", when, backup_count, max_bytes)
+            json_handler.setFormatter(JsonFormatter())
+            handlers.append(json_handler)
+
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(text_formatter)
+        handlers.append(stream_handler)
+
+        self.handlers = handlers
+        self.interval = interval
+        self.queue_size = queue_size
+        self.queue_handler = DroppingQueueHandler(None)
+        self.rate_limiter = RateLimitFilter(burst, interval)
+        self.queue_handler.addFilter(self.rate_limiter)
+
+        root = logging.getLogger()
+        root.setLevel(level)
+        root.addHandler(self.queue_handler)
+        self.start_threads()
+        atexit.register(self.stop)
+
+        # Threads do not survive fork (gunicorn workers, batch workers); restart them in the child
+        self.owner_pid = os.getpid()
+        os.register_at_fork(after_in_child=self.after_fork)
+
+    def after_fork(self):
+        """Reset state inherited from the parent and restart the threads in a forked child."""
+        # The parent's flusher may have held this lock at the moment of the fork
+        self.rate_limiter.lock = threading.Lock()
+        self.rate_limiter.windows = {}
+
+        # Only the process that set up logging rotates the files. Children
+        # append and reopen the file when the parent has rotated it.
+        handlers = []
+        for handler in self.handlers:
+            if isinstance(handler, SizeAndTimeRotatingFileHandler):
+                child_handler = logging.handlers.WatchedFileHandler(handler.baseFilename, delay=True)
+                child_handler.setFormatter(handler.formatter)
+                handlers.append(child_handler)
+            else:
+                handlers.append(handler)
+        self.handlers = handlers
+        self.start_threads()
+
+    def start_threads(self):
+        """Start the writer and the periodic summary flusher with a fresh queue."""
+        self.queue = queue.Queue(maxsize=self.queue_size)
+        self.queue_handler.queue = self.queue
+        self.queue_handler.dropped = 0
+        self.listener = logging.handlers.QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+
+        # Report suppressed repeats even when the message stops recurring
+        self.running = True
+        self.flusher = threading.Thread(target=self.flush_loop, args=(self.interval,), name="LogFlusher", daemon=True)
+        self.flusher.start()
+
+    def flush_loop(self, interval):
+        while self.running:
+            time.sleep(min(interval, 10.0))
+            self.rate_limiter.flush()
+            if os.getpid() == self.owner_pid:
+                # Rotate on schedule even if this process rarely logs (e.g. the gunicorn master)
+                for handler in self.handlers:
+                    if isinstance(handler, SizeAndTimeRotatingFileHandler):
+                        try:
+                            handler.check_rollover()
+                        except Exception as e:
+                            logging.getLogger("Logging").error(f"Error rotating {handler.baseFilename}: {e}")
+            if self.queue_handler.dropped:
+                dropped, self.queue_handler.dropped = self.queue_handler.dropped, 0
+                logging.getLogger("Logging").warning(f"Dropped {dropped} log records (queue full)",
+                                                     extra={"dropped": dropped})
+
+    def stop(self):
+        """Flush pending summaries and records to disk."""
+        if not self.running:
+            return
+        self.running = False
+        self.rate_limiter.flush()
+        self.listener.stop()
+
+def load_options(config_path):
+    """Read pipeline options from the "logging" section of the system config."""
+    try:
+        with open(config_path, 'r') as f:
+            config = json.load(f).get("logging", {})
+    except Exception:
+        return {}
+
+    options = {}
+    if "level" in config:
+        options["level"] = getattr(logging, str(config["level"]).upper(), logging.INFO)
+    if "max_size_mb" in config:
+        options["max_bytes"] = int(config["max_size_mb"] * 1024 * 1024)
+    if "repeat_window_seconds" in config:
+        options["interval"] = config["repeat_window_seconds"]
+    if "repeat_burst" in config:
+        options["burst"] = config["repeat_burst"]
+    for key in ("backup_count", "when", "queue_size", "json_log"):
+        if key in config:
+            options[key] = config[key]
+    return options
+
+def setup_logging(log_file, config_path=None, **options):
+    """Configure process-wide logging once; later calls are no-ops like logging.basicConfig."""
+    global _pipeline
+    if _pipeline is None:
+        if config_path:
+            options = {**load_options(config_path), **options}
+        _pipeline = LogPipeline(log_file, **options)
+    return _pipeline
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+import os
+import re
+import sys
+import json
+import time
+import base64
+import logging
+import argparse
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.log_pipeline import setup_logging
+
+# Configure logging: rate-limited, written by a background thread
+setup_logging("logs/coordinator.log", config_path="config/system.json")
+logger = logging.getLogger("Coordinator")
+
+# Image types nodes may upload alongside events
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png"}
+
+class Coordinator:
+    """Assigns cameras to analyzer nodes and stores the events they report.
+
+    Nodes send periodic heartbeats with their measured capacity (frames per
+    second they can run inference on) and current load. Each camera costs
+    its configured fps. Cameras are only placed on nodes that are ready and
+    report capacity. They stay on their node unless the node stops sending
+    heartbeats or cannot keep up with the frames its streams deliver, in
+    which case cameras are moved to the node with the most spare capacity.
+    """
+
+    def __init__(self, config_path, events_dir="events", node_timeout=15, overload_ratio=0.9):
+        self.config_path = config_path
+        self.events_dir = Path(events_dir)
+        self.node_timeout = node_timeout
+        self.overload_ratio = overload_ratio
+        self.lock = threading.Lock()
+        self.nodes = {}
+        self.assignments = {}
+        self.load_config()
+
+        # Create output directories
+        os.makedirs(self.events_dir, exist_ok=True)
+
+    def load_config(self):
+        """Load the camera list from the JSON configuration."""
+        try:
+            with open(self.config_path, 'r') as f:
+                config = json.load(f)
+            self.cameras = {
+                c.get("name", "Unknown"): c
+                for c in config.get("cameras", [])
+                if c.get("enabled", True)
+            }
+            logger.info(f"Loaded {len(self.cameras)} cameras from {self.config_path}")
+        except Exception as e:
+            logger.error(f"Failed to load config: {e}")
+            raise
+
+    def camera_cost(self, camera_name):
+        """Inference frames per second needed by a camera."""
+        return float(self.cameras[camera_name].get("fps", 5))
+
+    def node_cost(self, node_id):
+        """Total camera cost currently assigned to a node."""
+        return sum(self.camera_cost(c) for c, n in self.assignments.items() if n == node_id)
+
+    def heartbeat(self, node_id, report, now=None):
+        """Record a node heartbeat and return the cameras it should run."""
+        now = now or time.time()
+        with self.lock:
+            node = self.nodes.setdefault(node_id, {"first_seen": now, "capacity_cap": None})
+            if "last_seen" not in node:
+                logger.info(f"Node {node_id} joined")
+            node["last_seen"] = now
+            node["capacity"] = float(report.get("capacity_fps") or 0)
+            node["load_fps"] = float(report.get("load_fps") or 0)
+            node["target_fps"] = float(report.get("target_fps") or 0)
+            node["ready"] = bool(report.get("ready", True))
+            node["stats"] = report.get("stats")
+
+            # A node still loading its model has no meaningful load figures
+            if node["ready"]:
+                self.update_capacity_cap(node_id, node)
+            self.rebalance(now)
+
+            assigned = sorted(c for c, n in self.assignments.items() if n == node_id)
+            return [self.cameras[c] for c in assigned]
+
+    def update_capacity_cap(self, node_id, node):
+        """Cap a node's usable capacity when it falls behind its assigned load."""
+        # Only cameras with a live stream count towards the target
+        target = node["target_fps"]
+        if target and node["load_fps"] < target * self.overload_ratio:
+            if node["capacity_cap"] is None or node["load_fps"] < node["capacity_cap"]:
+                logger.warning(f"Node {node_id} overloaded: {node['load_fps']:.1f}/{target:.1f} fps")
+                node["capacity_cap"] = node["load_fps"]
+        elif node["capacity_cap"] is not None:
+            # Relax the cap while the node keeps up, never below what it is handling
+            node["capacity_cap"] = max(node["capacity_cap"] * 1.25, node["load_fps"] * 1.1, 1.0)
+            if node["capacity_cap"] >= node["capacity"]:
+                node["capacity_cap"] = None
+
+    def effective_capacity(self, node):
+        """Capacity used for placement, honouring any overload cap."""
+        if node["capacity_cap"] is None:
+            return node["capacity"]
+        return min(node["capacity"], node["capacity_cap"])
+
+    def placeable_nodes(self):
+        """Nodes that are ready and have measured capacity."""
+        return [n for n, node in self.nodes.items() if node.get("ready", True) and node["capacity"] > 0]
+
+    def spare_node(self, cost, exclude=None):
+        """Node with the most spare capacity if it can take `cost` more fps."""
+        candidates = [n for n in self.placeable_nodes() if n != exclude]
+        if not candidates:
+            return None
+        node_id = max(candidates, key=lambda n: self.effective_capacity(self.nodes[n]) - self.node_cost(n))
+        if self.effective_capacity(self.nodes[node_id]) - self.node_cost(node_id) < cost:
+            return None
+        return node_id
+
+    def rebalance(self, now):
+        """Reassign cameras from dead or overloaded nodes."""
+        # Forget nodes that stopped sending heartbeats
+        for node_id in list(self.nodes):
+            if now - self.nodes[node_id]["last_seen"] > self.node_timeout:
+                logger.warning(f"Node {node_id} timed out, reassigning its cameras")
+                del self.nodes[node_id]
+
+        for camera_name, node_id in list(self.assignments.items()):
+            if node_id not in self.nodes or camera_name not in self.cameras:
+                del self.assignments[camera_name]
+
+        if not self.nodes:
+            return
+
+        # Move the cheapest cameras off nodes assigned beyond their capacity,
+        # but only to nodes with room for them so cameras do not bounce back
+        for node_id, node in self.nodes.items():
+            if not node.get("ready", True):
+                continue
+            cameras = sorted((c for c, n in self.assignments.items() if n == node_id), key=self.camera_cost)
+            while len(cameras) > 1 and self.node_cost(node_id) > self.effective_capacity(node):
+                camera_name = cameras.pop(0)
+                target = self.spare_node(self.camera_cost(camera_name), exclude=node_id)
+                if target is None:
+                    break
+                self.assignments[camera_name] = target
+                logger.info(f"Moved camera {camera_name} from node {node_id} to node {target}")
+
+        # Place unassigned cameras, most expensive first, on the ready node with the most spare capacity
+        candidates = self.placeable_nodes()
+        if not candidates:
+            return
+        unassigned = [c for c in self.cameras if c not in self.assignments]
+        for camera_name in sorted(unassigned, key=self.camera_cost, reverse=True):
+            node_id = max(candidates, key=lambda n: self.effective_capacity(self.nodes[n]) - self.node_cost(n))
+            self.assignments[camera_name] = node_id
+            logger.info(f"Assigned camera {camera_name} to node {node_id}")
+
+    def event_path(self, name, suffixes=None):
+        """Path for a file named by a node, confined to the events directory."""
+        # Nodes are not authenticated, so only plain file names are accepted
+        name = re.sub(r"[^\w .-]", "_", os.path.basename(str(name))).strip()
+        if not name or name.startswith("."):
+            raise ValueError(f"Invalid event file name: {name!r}")
+        if suffixes and Path(name).suffix.lower() not in suffixes:
+            raise ValueError(f"Invalid event file type: {name!r}")
+        path = (self.events_dir / name).resolve()
+        if path.parent != self.events_dir.resolve():
+            raise ValueError(f"Event file outside the events directory: {name!r}")
+        return path
+
+    def store_event(self, event_data, image_name=None, image_data=None, images=None):
+        """Write a reported event into the central events directory."""
+        camera_name = event_data.get("camera", "Unknown")
+        detection_type = event_data.get("type", "Unknown")
+        timestamp = event_data.get("timestamp", time.strftime("%Y%m%d_%H%M%S"))
+        event_data_path = self.event_path(f"{camera_name}_{detection_type}_{timestamp}.json")
+        base_name = event_data_path.stem
+
+        if image_data is not None:
+            image_path = self.event_path(image_name or f"{base_name}.jpg", IMAGE_SUFFIXES)
+            with open(image_path, 'wb') as f:
+                f.write(image_data)
+            event_data["image_path"] = str(Path("events") / image_path.name)
+
+        # Additional per-camera images of a correlated incident
+        if images:
+            image_paths = []
+            for name, data in images:
+                image_path = self.event_path(name, IMAGE_SUFFIXES)
+                with open(image_path, 'wb') as f:
+                    f.write(data)
+                image_paths.append(str(Path("events") / image_path.name))
+            event_data["image_paths"] = image_paths
+
+        # Write under a temporary name so readers never see a partial file
+        tmp_path = event_data_path.with_name(f".{base_name}.json.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(event_data, f, indent=2)
+        os.replace(tmp_path, event_data_path)
+        logger.info(f"Stored event from node {event_data.get('node', 'unknown')}: {base_name}")
+
+    def status(self):
+        """Current nodes and camera assignments."""
+        with self.lock:
+            return {
+                "nodes": {
+                    node_id: {
+                        "capacity_fps": node["capacity"],
+                        "effective_capacity_fps": self.effective_capacity(node),
+                        "load_fps": node["load_fps"],
+                        "assigned_fps": self.node_cost(node_id),
+                        "last_seen": node["last_seen"],
+                        "ready": node.get("ready", True),
+                        "stats": node.get("stats"),
+                    }
+                    for node_id, node in self.nodes.items()
+                },
+                "assignments": dict(self.assignments),
+            }
+
+class CoordinatorHandler(BaseHTTPRequestHandler):
+    """JSON HTTP interface used by analyzer nodes."""
+
+    coordinator = None
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/status":
+            self.send_json(self.coordinator.status())
+        else:
+            self.send_json({"status": "error", "message": "Not found"}, 404)
+
+    def do_POST(self):
+        try:
+            data = self.read_json()
+            if self.path == "/heartbeat":
+                cameras = self.coordinator.heartbeat(data["node_id"], data)
+                self.send_json({"status": "success", "cameras": cameras})
+            elif self.path == "/events":
+                image_data = base64.b64decode(data["image"]) if data.get("image") else None
+                images = [(i["name"], base64.b64decode(i["image"])) for i in data.get("images", [])]
+                self.coordinator.store_event(data["event"], data.get("image_name"), image_data, images)
+                self.send_json({"status": "success"})
+            else:
+                self.send_json({"status": "error", "message": "Not found"}, 404)
+        except Exception as e:
+            logger.error(f"Error handling {self.path}: {e}")
+            self.send_json({"status": "error", "message": str(e)}, 400)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Camera Analyzer Coordinator")
+    parser.add_argument("--config", default="config/system.json", help="Path to configuration file")
+    parser.add_argument("--events-dir", default="events", help="Central events directory read by the web UI")
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        cluster_config = json.load(f).get("cluster", {})
+
+    coordinator = Coordinator(
+        args.config,
+        args.events_dir,
+        node_timeout=cluster_config.get("node_timeout", 15),
+        overload_ratio=cluster_config.get("overload_ratio", 0.9)
+    )
+    CoordinatorHandler.coordinator = coordinator
+
+    host = cluster_config.get("host", "127.0.0.1")
+    port = cluster_config.get("port", 9000)
+    server = ThreadingHTTPServer((host, port), CoordinatorHandler)
+    logger.info(f"Coordinator listening on {host}:{port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import queue
+import logging
+import multiprocessing
+from pathlib import Path
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import cv2
+
+logger = logging.getLogger("BatchAnalyzer")
+
+VIDEO_EXTENSIONS = {".mp4", ".mkv", ".avi", ".mov", ".ts", ".m4v", ".dav", ".h264", ".h265"}
+
+# Model loaded once per worker process by init_worker
+_worker = {}
+
+def find_videos(paths):
+    """Expand files and directories into a sorted list of video files."""
+    videos = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            videos.extend(p for p in sorted(path.rglob("*")) if p.suffix.lower() in VIDEO_EXTENSIONS)
+        elif path.is_file():
+            videos.append(path)
+        else:
+            logger.warning(f"Skipping missing path: {path}")
+    return videos
+
+def plan_chunks(videos, chunk_seconds):
+    """Split each video into frame ranges of about `chunk_seconds`."""
+    chunks = []
+    for video in videos:
+        cap = cv2.VideoCapture(str(video))
+        if not cap.isOpened():
+            logger.error(f"Failed to open video file: {video}")
+            continue
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        cap.release()
+
+        if frame_count <= 0:
+            # Unknown length: process the whole file as one chunk
+            chunks.append({"video": str(video), "fps": fps, "start": 0, "end": None})
+            continue
+
+        step = max(1, int(chunk_seconds * fps))
+        for start in range(0, frame_count, step):
+            chunks.append({"video": str(video), "fps": fps, "start": start, "end": min(start + step, frame_count)})
+    return chunks
+
+def init_worker(weights, threads):
+    """Load the model once per worker process."""
+    import torch
+    from ultralytics import YOLO
+
+    # Split the CPU between workers instead of every worker using all cores
+    torch.set_num_threads(threads)
+    _worker["model"] = YOLO(weights)
+
+def annotate_and_save(frame, output_dir, base_name, event_data):
+    """Write the annotated image and event metadata."""
+    annotated_frame = frame.copy()
+    for obj in event_data["objects"]:
+        bbox = obj["bbox"]
+        cv2.rectangle(annotated_frame, (bbox[0], bbox[1]), (bbox[2], bbox[3]), (0, 255, 0), 2)
+        cv2.putText(annotated_frame, f"{obj['class']}: {obj['confidence']:.2f}", (bbox[0], bbox[1] - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+
+    image_path = Path(output_dir) / f"{base_name}.jpg"
+    cv2.imwrite(str(image_path), annotated_frame)
+    event_data["image_path"] = str(image_path)
+
+    with open(Path(output_dir) / f"{base_name}.json", 'w') as f:
+        json.dump(event_data, f, indent=2)
+
+def process_chunk(chunk, options, progress):
+    """Decode one chunk as fast as possible, run batched inference and save events.
+
+    Returns the saved events' (type, video time, base name) so the cooldown
+    can be applied across chunk boundaries by `apply_cooldown`.
+    """
+    model = _worker["model"]
+    class_mapping = options["class_mapping"]
+    enabled = options["detections"]
+    sample_every = max(1, round(chunk["fps"] / options["fps"]))
+    batch_size = options["batch_size"]
+    min_conf = options["confidence"]
+    cooldown = options["cooldown"]
+
+    video = Path(chunk["video"])
+    camera_name = video.stem
+
+    # Best estimate of wall-clock start: file mtime minus its duration
+    cap = cv2.VideoCapture(str(video))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    video_start = datetime.fromtimestamp(video.stat().st_mtime) - timedelta(seconds=max(0, total_frames) / chunk["fps"])
+    if chunk["start"]:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, chunk["start"])
+
+    stats = {"decoded": 0, "inferred": 0}
+    saved = []
+    last_event = {}
+    batch = []
+
+    def infer_batch():
+        results = model([frame for _, frame in batch], imgsz=options["input_size"], verbose=False)
+        for (frame_index, frame), result in zip(batch, results):
+            found_objects = {}
+            for box in result.boxes:
+                class_name = result.names[int(box.cls[0])]
+                confidence = float(box.conf[0])
+                if confidence < min_conf:
+                    continue
+                for detection_type, classes in class_mapping.items():
+                    if class_name in classes and detection_type in enabled:
+                        x1, y1, x2, y2 = [int(v) for v in box.xyxy[0].cpu().numpy()]
+                        found_objects.setdefault(detection_type, []).append({
+                            "confidence": confidence,
+                            "bbox": [x1, y1, x2, y2],
+                            "class": class_name
+                        })
+                        break
+
+            video_time = frame_index / chunk["fps"]
+            for detection_type, objects in found_objects.items():
+                # Cooldown in video time, matching the live analyzer's behaviour
+                if video_time - last_event.get(detection_type, -cooldown) < cooldown:
+                    continue
+                last_event[detection_type] = video_time
+
+                timestamp = (video_start + timedelta(seconds=video_time)).strftime("%Y%m%d_%H%M%S")
+                base_name = f"{camera_name}_{detection_type}_{timestamp}_{frame_index}"
+                annotate_and_save(frame, options["output_dir"], base_name, {
+                    "camera": camera_name,
+                    "type": detection_type,
+                    "timestamp": timestamp,
+                    "source_file": str(video),
+                    "video_time": round(video_time, 3),
+                    "objects": objects
+                })
+                saved.append((detection_type, video_time, base_name))
+
+        stats["inferred"] += len(batch)
+        progress.put(("inferred", len(batch)))
+        batch.clear()
+
+    frame_index = chunk["start"]
+    try:
+        while chunk["end"] is None or frame_index < chunk["end"]:
+            # Only fully decode the frames that will be analyzed
+            if (frame_index - chunk["start"]) % sample_every:
+                if not cap.grab():
+                    break
+                frame_index += 1
+                stats["decoded"] += 1
+                continue
+
+            ret, frame = cap.read()
+            if not ret:
+                break
+            stats["decoded"] += 1
+            batch.append((frame_index, frame))
+            frame_index += 1
+
+            if len(batch) >= batch_size:
+                progress.put(("decoded", stats["decoded"]))
+                stats["decoded"] = 0
+                infer_batch()
+
+        if batch:
+            infer_batch()
+    finally:
+        cap.release()
+        progress.put(("decoded", stats["decoded"]))
+        progress.put(("chunk", 1))
+
+    return saved
+
+def apply_cooldown(saved, cooldown, output_dir):
+    """Drop events within `cooldown` of the previous kept event of the same file and type.
+
+    Chunks are analyzed independently, so each one starts without a cooldown;
+    the live analyzer would not have produced these events.
+    """
+    dropped = 0
+    for (video, detection_type), events in saved.items():
+        last_kept = None
+        for video_time, base_name in sorted(events):
+            if last_kept is not None and video_time - last_kept < cooldown:
+                for suffix in (".json", ".jpg"):
+                    try:
+                        os.remove(Path(output_dir) / f"{base_name}{suffix}")
+                    except FileNotFoundError:
+                        pass
+                dropped += 1
+                continue
+            last_kept = video_time
+    return dropped
+
+def run_batch(paths, config, output_dir, class_mapping, fps=None, workers=None,
+              batch_size=8, chunk_seconds=300, weights=None, input_size=None,
+              confidence=None, cooldown=None):
+    """Re-analyze recorded footage and write events to `output_dir`.
+
+    Model and thresholds default to the live settings in `config`, so a run
+    can be repeated with different ones to compare results.
+    """
+    start_time = time.time()
+    os.makedirs(output_dir, exist_ok=True)
+
+    videos = find_videos(paths)
+    chunks = plan_chunks(videos, chunk_seconds)
+    if not chunks:
+        logger.error("No video files to analyze")
+        return None
+
+    # Analyze every detection type the live system knows about
+    detections = set()
+    for camera in config.get("cameras", []):
+        detections.update(camera.get("detections", ["person", "vehicle"]))
+
+    models_config = config.get("models", {})
+    detection_config = config.get("detection", {})
+    weights = weights or models_config.get("default_weights", "yolov8n.pt")
+    options = {
+        "class_mapping": class_mapping,
+        "detections": sorted(detections) or ["person", "vehicle"],
+        "fps": fps or 5,
+        "batch_size": batch_size,
+        "input_size": input_size or models_config.get("input_size", 640),
+        "confidence": confidence if confidence is not None else detection_config.get("confidence", 0.5),
+        "cooldown": cooldown if cooldown is not None else detection_config.get("cooldown_seconds", 60),
+        "output_dir": output_dir
+    }
+
+    workers = workers or max(1, (os.cpu_count() or 2) // 2)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    expected_frames = sum((c["end"] - c["start"]) for c in chunks if c["end"] is not None)
+    logger.info(f"Analyzing {len(videos)} files in {len(chunks)} chunks with {workers} workers "
+                f"using {weights} (input {options['input_size']}, confidence {options['confidence']}, "
+                f"cooldown {options['cooldown']}s)")
+
+    manager = multiprocessing.Manager()
+    progress = manager.Queue()
+    totals = {"decoded": 0, "inferred": 0, "chunk": 0}
+    saved = {}
+
+    def drain(report=False):
+        while True:
+            try:
+                kind, count = progress.get_nowait()
+            except queue.Empty:
+                break
+            totals[kind] += count
+        if report:
+            elapsed = time.time() - start_time
+            done = f"{totals['decoded'] / expected_frames * 100:.1f}%" if expected_frames else "?"
+            print(f"Progress: {done} chunks {totals['chunk']}/{len(chunks)}, "
+                  f"decoded {totals['decoded'] / elapsed:.1f} fps, "
+                  f"inferred {totals['inferred'] / elapsed:.1f} fps")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(weights, threads)) as executor:
+        futures = {executor.submit(process_chunk, chunk, options, progress): chunk for chunk in chunks}
+        pending = set(futures)
+        last_report = time.time()
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    for detection_type, video_time, base_name in future.result():
+                        saved.setdefault((futures[future]["video"], detection_type), []).append((video_time, base_name))
+                except Exception as e:
+                    logger.error(f"Error analyzing chunk: {e}")
+            report = time.time() - last_report >= 5
+            if report:
+                last_report = time.time()
+            drain(report)
+
+    drain()
+    dropped = apply_cooldown(saved, options["cooldown"], output_dir)
+    events = sum(len(e) for e in saved.values()) - dropped
+    elapsed = time.time() - start_time
+    summary = {
+        "model": weights,
+        "input_size": options["input_size"],
+        "confidence": options["confidence"],
+        "cooldown_seconds": options["cooldown"],
+        "files": len(videos),
+        "chunks": len(chunks),
+        "workers": workers,
+        "frames_decoded": totals["decoded"],
+        "frames_inferred": totals["inferred"],
+        "events": events,
+        "events_dropped_by_cooldown": dropped,
+        "elapsed_seconds": round(elapsed, 2),
+        "decode_fps": round(totals["decoded"] / elapsed, 1),
+        "inference_fps": round(totals["inferred"] / elapsed, 1),
+        "realtime_factor": round(totals["decoded"] / elapsed / (sum(c["fps"] for c in chunks) / len(chunks)), 1)
+    }
+    with open(Path(output_dir) / "summary.json", 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    logger.info(f"Batch analysis complete: {summary}")
+    return summary
@@ -1,39 +1,102 @@
 #!/usr/bin/env python3
 import os
+import sys
 import cv2
 import time
 import json
 import logging
+import signal
+import socket
 import argparse
 import threading
 from pathlib import Path
 from datetime import datetime
 import numpy as np
-from ultralytics import YOLO
+from static_suppression import StaticObjectSuppressor
+from profiler import AnalyzerProfiler
+from node_client import NodeClient
+from cascade import CascadeDetector
+from model_registry import ModelRegistry, ModelSpec
+from event_correlator import EventCorrelator
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("logs/camera_analyzer.log"),
-        logging.StreamHandler()
-    ]
-)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.log_pipeline import setup_logging
+
+# Configure logging: rate-limited, written by a background thread
+setup_logging("logs/camera_analyzer.log", config_path="config/system.json")
 logger = logging.getLogger("CameraAnalyzer")
 
+# YOLO classes reported for each detection type
+CLASS_MAPPING = {
+    "person": ["person"],
+    "vehicle": ["car", "truck", "bus", "motorcycle"],
+    "animal": ["dog", "cat", "bird", "horse", "sheep", "cow", "elephant", "bear", "zebra", "giraffe"]
+}
+
 class CameraAnalyzer:
-    def __init__(self, config_path):
+    def __init__(self, config_path, events_dir="events"):
         """Initialize the Camera Analyzer with the provided configuration."""
         self.config_path = config_path
+        self.events_dir = Path(events_dir)
+        self.startup_begin = time.time()
+        self.startup_times = {}
         self.load_config()
-        self.setup_models()
+        self.startup_times["config_load"] = time.time() - self.startup_begin
+        
+        # Models are shared between cameras; each camera may name its own
+        models_config = self.config.get("models", {})
+        self.models = ModelRegistry(models_config.get("memory_cap_mb", 1024), models_config.get("min_idle_seconds", 60))
+        self.default_model = ModelSpec(
+            models_config.get("default_weights", "yolov8n.pt"),
+            models_config.get("backend", "pytorch"),
+            models_config.get("input_size", 640)
+        )
+        
+        # Models are loaded in the background by start() while camera streams are opened
+        self.model_error = None
+        self.model_ready = threading.Event()
+        self.model_thread = None
+        
+        # Readiness tracking
+        startup_config = self.config.get("startup", {})
+        self.ready_file = startup_config.get("ready_file", "logs/analyzer.ready")
+        self.ready_timeout = startup_config.get("ready_timeout", 60)
+        self.ready_timer = None
+        self.ready_written = False
+        self.started_cameras = set()
+        self.startup_lock = threading.Lock()
+        self.clear_ready_file()
+        
+        detection_config = self.config.get("detection", {})
+        self.min_confidence = detection_config.get("confidence", 0.5)
+        self.cooldown = detection_config.get("cooldown_seconds", 60)
         self.last_detection_time = {}
+        self.last_suppressed_time = {}
+        self.suppressor = StaticObjectSuppressor(self.config.get("suppression", {}))
+        self.cascade = CascadeDetector(self.config.get("cascade", {}), self.models)
+        self.correlator = EventCorrelator(self.config.get("correlation", {}), self.save_detection_event, self.save_incident)
+        
+        # On-demand profiling, toggled by SIGUSR1 or the web UI
+        profiling_config = self.config.get("profiling", {})
+        self.profiler = AnalyzerProfiler(profiling_config.get("output_dir", "logs/profiles"))
+        self.profile_request_file = profiling_config.get("request_file", "logs/profile_request.json")
+        
+        # Pipeline statistics are logged periodically and sent with heartbeats
+        self.stats_interval = self.config.get("logging", {}).get("stats_interval_seconds", 300)
         self.running = False
-        self.threads = []
+        self.camera_threads = {}
+        
+        # Load statistics reported to the coordinator in cluster mode
+        self.node_client = None
+        self.assigned_cameras = None
+        self.inference_time = None
+        self.frames_processed = {}
+        self.read_wait = {}
+        self.streaming = set()
+        self.last_report = (time.time(), {})
         
         # Create output directories
-        os.makedirs("events", exist_ok=True)
+        os.makedirs(self.events_dir, exist_ok=True)
         
     def load_config(self):
         """Load configuration from JSON file."""
@@ -45,44 +108,282 @@ class CameraAnalyzer:
             logger.error(f"Failed to load config: {e}")
             raise
             
+    def model_spec(self, camera_config):
+        """Model used for a camera: its own `model`/`input_size`/`backend` or the defaults."""
+        return ModelSpec(
+            camera_config.get("model", self.default_model.weights),
+            camera_config.get("backend", self.default_model.backend),
+            camera_config.get("input_size", self.default_model.input_size)
+        )
+        
     def setup_models(self):
         """Initialize detection models."""
         try:
-            logger.info("Loading YOLOv8 model...")
-            # Load YOLOv8 model
-            self.model = YOLO("yolov8n.pt")  # Use small model for speed
-            logger.info("YOLOv8 model loaded successfully")
+            logger.info("Loading YOLOv8 models...")
+            # Import here so torch is only loaded off the startup critical path
+            start = time.time()
+            from ultralytics import YOLO
+            self.record_startup_time("model_import", time.time() - start)
+            
+            # Load each distinct model used by the enabled cameras once
+            start = time.time()
+            specs = []
+            for camera in self.config.get("cameras", []):
+                spec = self.model_spec(camera)
+                if camera.get("enabled", True) and spec not in specs:
+                    specs.append(spec)
+            specs = specs or [self.default_model]
+            # The first model must load; the rest are loaded on first use if this fails
+            self.models.release(self.models.get_entry(specs[0]))
+            self.models.preload(specs[1:])
+            self.record_startup_time("model_load", time.time() - start)
+            logger.info(f"YOLOv8 models loaded successfully: {specs}")
+            
+            # Pay JIT and allocator warmup before the first real frame
+            start = time.time()
+            self.warmup_model(specs[0])
+            self.record_startup_time("model_warmup", time.time() - start)
             
         except Exception as e:
             logger.error(f"Error setting up models: {e}")
             raise
+            
+    def warmup_model(self, spec):
+        """Run inference on a dummy batch so the first detection is not slowed down."""
+        dummy_batch = [np.zeros((spec.input_size, spec.input_size, 3), dtype=np.uint8)] * 2
+        for _ in range(2):
+            start = time.time()
+            self.models.predict(spec, dummy_batch)
+        
+        # The warm pass gives an initial per-frame inference time estimate
+        self.inference_time = (time.time() - start) / len(dummy_batch)
+        
+    def update_inference_time(self, elapsed):
+        """Track an exponentially weighted average of per-frame inference time."""
+        if self.inference_time is None:
+            self.inference_time = elapsed
+        else:
+            self.inference_time = 0.9 * self.inference_time + 0.1 * elapsed
+            
+    def load_models_async(self):
+        """Load models in a background thread and signal when they are ready."""
+        try:
+            self.setup_models()
+        except Exception as e:
+            self.model_error = e
+            return
+        self.model_ready.set()
+        self.check_ready()
+        
+    def clear_ready_file(self):
+        """Remove a readiness file left over from a previous run."""
+        try:
+            os.remove(self.ready_file)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error removing ready file: {e}")
+            
+    def record_startup_time(self, name, seconds):
+        """Add a startup step; camera and model threads report while the ready timer may read."""
+        with self.startup_lock:
+            self.startup_times[name] = seconds
+            
+    def mark_camera_started(self, camera_name):
+        """Record that a camera processed its first frame or failed to open."""
+        with self.startup_lock:
+            if camera_name in self.started_cameras:
+                return
+            self.started_cameras.add(camera_name)
+            self.startup_times[f"first_frame.{camera_name}"] = time.time() - self.startup_begin
+        self.check_ready()
+        
+    def check_ready(self):
+        """Write the readiness file once the model and all cameras are up."""
+        if self.node_client and self.assigned_cameras is None:
+            return
+        expected = {c.get("name", "Unknown") for c in self.active_cameras()}
+        with self.startup_lock:
+            if not self.model_ready.is_set() or not expected <= self.started_cameras:
+                return
+        self.write_ready_file()
+        
+    def write_ready_file(self, timed_out=False):
+        """Write the readiness file with the startup time breakdown."""
+        with self.startup_lock:
+            if self.ready_written:
+                return
+            # A timed-out report is replaced once startup actually completes
+            if not timed_out:
+                self.ready_written = True
+                if self.ready_timer:
+                    self.ready_timer.cancel()
+            total = time.time() - self.startup_begin
+            breakdown = {k: round(v, 3) for k, v in self.startup_times.items()}
+            
+        status = {
+            "ready": not timed_out,
+            "timed_out": timed_out,
+            "model_ready": self.model_ready.is_set(),
+            "startup_seconds": round(total, 3),
+            "breakdown": breakdown,
+            "pid": os.getpid()
+        }
+        try:
+            os.makedirs(os.path.dirname(self.ready_file) or ".", exist_ok=True)
+            tmp_path = f"{self.ready_file}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(status, f, indent=2)
+            os.replace(tmp_path, self.ready_file)
+        except Exception as e:
+            logger.error(f"Error writing ready file: {e}")
+            
+        if timed_out:
+            logger.warning(f"Startup not complete after {total:.1f}s: {breakdown}")
+        else:
+            logger.info(f"Camera analyzer ready in {total:.1f}s: {breakdown}")
+            
+    def active_cameras(self):
+        """Enabled cameras from the configuration, or those assigned by the coordinator."""
+        if self.node_client:
+            return self.assigned_cameras or []
+        return [c for c in self.config.get("cameras", []) if c.get("enabled", True)]
+        
+    def pipeline_stats(self):
+        """Model, suppression and correlation statistics."""
+        return {
+            "models": self.models.stats(),
+            "suppression": self.suppressor.stats(),
+            "correlation": self.correlator.stats()
+        }
+        
+    def log_stats(self):
+        """Log a summary of the pipeline statistics, with the full set as structured fields."""
+        stats = self.pipeline_stats()
+        models = stats["models"]
+        suppressed = sum(stats["suppression"]["suppressed_total"].values())
+        correlation = stats["correlation"]
+        logger.info(f"Models: {len(models['models'])} loaded, ~{models['memory_mb']} of {models['memory_cap_mb']} MB, "
+                    f"{models['loads']} loads, {models['evictions']} evictions; "
+                    f"{suppressed} static events suppressed; "
+                    f"{correlation['merged_events']} events merged, {correlation['open_incidents']} incidents open",
+                    extra={"stats": stats})
+        
+    def node_report(self):
+        """Measured capacity and load for the coordinator heartbeat."""
+        now = time.time()
+        counters = {name: (frames, self.read_wait.get(name, 0.0)) for name, frames in self.frames_processed.items()}
+        last_time, last_counters = self.last_report
+        self.last_report = (now, counters)
+        
+        # Nothing is measured until the model has loaded; the coordinator
+        # neither places cameras on nor judges the load of a node that is not ready
+        if not self.model_ready.is_set():
+            return {"ready": False, "capacity_fps": 0, "load_fps": 0, "target_fps": 0,
+                    "cameras": sorted(self.camera_threads), "stats": self.pipeline_stats()}
+        
+        # Capacity is the inference rate this node sustains, unless configured
+        cluster_config = self.config.get("cluster", {})
+        capacity = cluster_config.get("capacity_fps")
+        if capacity is None and self.inference_time:
+            capacity = cluster_config.get("inference_parallelism", 1) / self.inference_time
+            
+        elapsed = max(now - last_time, 1e-6)
+        load = 0.0
+        target = 0.0
+        for camera in self.active_cameras():
+            camera_name = camera.get("name", "Unknown")
+            frames, wait = counters.get(camera_name, (0, 0.0))
+            last_frames, last_wait = last_counters.get(camera_name, (frames, wait))
+            rate = (frames - last_frames) / elapsed
+            load += rate
+            if camera_name not in self.streaming:
+                continue
+            # A camera that mostly waits on its stream is limited by the source,
+            # not by this node: expect only the frames it actually delivers
+            if (wait - last_wait) / elapsed > 0.5:
+                target += min(camera.get("fps", 5), rate)
+            else:
+                target += camera.get("fps", 5)
+        return {
+            "ready": True,
+            "capacity_fps": capacity or 0,
+            "load_fps": load,
+            "target_fps": target,
+            "cameras": sorted(self.camera_threads),
+            "stats": self.pipeline_stats()
+        }
+        
+    def apply_assignment(self, cameras):
+        """Start and stop camera threads to match the coordinator's assignment."""
+        assigned = {c.get("name", "Unknown"): c for c in cameras}
+        self.assigned_cameras = cameras
+        
+        for camera_name in list(self.camera_threads):
+            _, _, camera_config = self.camera_threads[camera_name]
+            if assigned.get(camera_name) != camera_config:
+                logger.info(f"Camera {camera_name} unassigned from this node")
+                self.stop_camera(camera_name)
+                
+        if self.running:
+            for camera_name, camera_config in assigned.items():
+                if camera_name not in self.camera_threads:
+                    logger.info(f"Camera {camera_name} assigned to this node")
+                    self.start_camera(camera_config)
+        self.check_ready()
+        
+    def start_camera(self, camera_config):
+        """Start a processing thread for one camera."""
+        camera_name = camera_config.get("name", "Unknown")
+        stop_event = threading.Event()
+        thread = threading.Thread(
+            target=self.process_camera,
+            args=(camera_config, stop_event),
+            name=f"Camera-{camera_name}",
+            daemon=True
+        )
+        self.camera_threads[camera_name] = (thread, stop_event, camera_config)
+        thread.start()
+        
+    def stop_camera(self, camera_name, timeout=5.0):
+        """Stop the processing thread for one camera."""
+        thread, stop_event, _ = self.camera_threads.pop(camera_name)
+        stop_event.set()
+        thread.join(timeout=timeout)
+        self.streaming.discard(camera_name)
     
-    def process_camera(self, camera_config):
+    def process_camera(self, camera_config, stop_event=None):
         """Process video from a camera."""
         camera_name = camera_config.get("name", "Unknown")
         camera_url = camera_config.get("url")
         
         if not camera_url:
             logger.error(f"No URL provided for camera {camera_name}")
+            self.mark_camera_started(camera_name)
             return
             
         logger.info(f"Starting processing for camera: {camera_name}")
         
         # Get detection settings
         detections_enabled = camera_config.get("detections", ["person", "vehicle"])
+        model_spec = self.model_spec(camera_config)
         fps = camera_config.get("fps", 5)
         frame_interval = 1.0 / fps
         
         try:
             # Open the video stream
+            open_start = time.time()
             cap = cv2.VideoCapture(camera_url)
+            self.record_startup_time(f"stream_open.{camera_name}", time.time() - open_start)
             if not cap.isOpened():
                 logger.error(f"Failed to open camera stream: {camera_url}")
+                self.mark_camera_started(camera_name)
                 return
                 
             last_frame_time = 0
+            self.streaming.add(camera_name)
                 
-            while self.running:
+            while self.running and not (stop_event and stop_event.is_set()):
                 # Control processing rate
                 current_time = time.time()
                 if current_time - last_frame_time < frame_interval:
@@ -92,33 +393,46 @@ class CameraAnalyzer:
                 last_frame_time = current_time
                 
                 # Read frame
-                ret, frame = cap.read()
+                with self.profiler.span("read_frame"):
+                    read_start = time.time()
+                    ret, frame = cap.read()
+                    self.read_wait[camera_name] = self.read_wait.get(camera_name, 0.0) + time.time() - read_start
                 if not ret:
-                    logger.warning(f"Failed to read frame from {camera_name}, reconnecting...")
+                    logger.warning(f"Failed to read frame from {camera_name}, reconnecting...",
+                                   extra={"camera": camera_name, "stage": "read_frame"})
+                    self.streaming.discard(camera_name)
                     cap.release()
                     time.sleep(5)
                     cap = cv2.VideoCapture(camera_url)
+                    if cap.isOpened():
+                        self.streaming.add(camera_name)
+                    continue
+                
+                # Keep the stream drained until the model has loaded
+                if not self.model_ready.is_set():
                     continue
                 
                 # Process frame - object detection
-                if any(d in ["person", "vehicle", "animal"] for d in detections_enabled):
-                    self.detect_objects(frame, camera_name, detections_enabled)
+                if any(d in ["person", "vehicle", "animal", "face", "fire"] for d in detections_enabled):
+                    with self.profiler.span("detect_objects"):
+                        self.detect_objects(frame, camera_name, detections_enabled, model_spec)
+                self.frames_processed[camera_name] = self.frames_processed.get(camera_name, 0) + 1
+                    
+                if camera_name not in self.started_cameras:
+                    self.mark_camera_started(camera_name)
                     
         except Exception as e:
-            logger.error(f"Error processing camera {camera_name}: {e}")
+            logger.error(f"Error processing camera {camera_name}: {e}", extra={"camera": camera_name, "stage": "process_camera"})
         finally:
+            self.streaming.discard(camera_name)
             if 'cap' in locals() and cap is not None:
                 cap.release()
     
-    def detect_objects(self, frame, camera_name, enabled_detections):
+    def detect_objects(self, frame, camera_name, enabled_detections, model_spec=None):
         """Detect objects in frame using YOLOv8."""
         try:
             # Detection classes of interest
-            class_mapping = {
-                "person": ["person"],
-                "vehicle": ["car", "truck", "bus", "motorcycle"],
-                "animal": ["dog", "cat", "bird", "horse", "sheep", "cow", "elephant", "bear", "zebra", "giraffe"]
-            }
+            class_mapping = CLASS_MAPPING
             
             # Classes to detect
             classes_to_detect = []
@@ -126,13 +440,19 @@ class CameraAnalyzer:
                 if detection_type in class_mapping:
                     classes_to_detect.extend(class_mapping[detection_type])
             
-            # Run YOLOv8 detection
-            results = self.model(frame, verbose=False)
+            # Run YOLOv8 detection (face detection needs its person boxes)
+            results = []
+            if classes_to_detect or "face" in enabled_detections:
+                with self.profiler.span("inference"):
+                    inference_start = time.time()
+                    results = self.models.predict(model_spec or self.default_model, frame)
+                    self.update_inference_time(time.time() - inference_start)
             
             # Process results
+            found_objects = {}
+            person_boxes = []
             for result in results:
                 boxes = result.boxes
-                found_objects = {}
                 
                 for box in boxes:
                     # Get class information
@@ -140,6 +460,10 @@ class CameraAnalyzer:
                     class_name = result.names[class_id]
                     confidence = float(box.conf[0])
                     
+                    # Person boxes feed the face cascade even if person events are off
+                    if class_name == "person" and confidence >= self.min_confidence and "face" in enabled_detections:
+                        person_boxes.append(box.xyxy[0].cpu().numpy().astype(int))
+                    
                     # Check if this class is one we want to detect
                     detection_type = None
                     for d_type, classes in class_mapping.items():
@@ -151,7 +475,7 @@ class CameraAnalyzer:
                         continue
                         
                     # Check minimum confidence (0.5 by default)
-                    if confidence < 0.5:
+                    if confidence < self.min_confidence:
                         continue
                         
                     # Get bounding box
@@ -167,72 +491,126 @@ class CameraAnalyzer:
                         "class": class_name
                     })
                     
-                # Process detected objects
-                for detection_type, objects in found_objects.items():
-                    if objects:
-                        # Check cooldown period (1 minute by default)
-                        current_time = time.time()
-                        key = f"{camera_name}_{detection_type}"
-                        
-                        if key in self.last_detection_time:
-                            time_since_last = current_time - self.last_detection_time[key]
-                            if time_since_last < 60:  # 60 seconds cooldown
-                                continue
-                                
-                        # Update last detection time
-                        self.last_detection_time[key] = current_time
-                        
-                        # Save event
-                        self.save_detection_event(frame, camera_name, detection_type, objects)
+            # Second stage: specialised models on person crops and fire-candidate regions only
+            if "face" in enabled_detections and person_boxes:
+                with self.profiler.span("cascade_face"):
+                    faces = self.cascade.detect_faces(frame, camera_name, person_boxes)
+                if faces:
+                    found_objects["face"] = faces
+                    
+            if "fire" in enabled_detections:
+                with self.profiler.span("cascade_fire"):
+                    fires = self.cascade.detect_fire(frame, camera_name)
+                if fires:
+                    found_objects["fire"] = fires
+                    
+            # Process detected objects
+            for detection_type, objects in found_objects.items():
+                if objects:
+                    # Track signatures every frame so stationary objects are recognised
+                    moving_objects = self.suppressor.filter(frame, camera_name, objects)
+                    
+                    # Check cooldown period (1 minute by default)
+                    current_time = time.time()
+                    key = f"{camera_name}_{detection_type}"
+                    
+                    if key in self.last_detection_time:
+                        time_since_last = current_time - self.last_detection_time[key]
+                        if time_since_last < self.cooldown:
+                            continue
+                            
+                    # Skip events made up only of already reported static objects.
+                    # This does not start a cooldown, so a newly arrived object is reported at once.
+                    if not moving_objects:
+                        if current_time - self.last_suppressed_time.get(key, 0) >= self.cooldown:
+                            self.last_suppressed_time[key] = current_time
+                            self.suppressor.record_suppressed(camera_name, detection_type)
+                        continue
+                    objects = moving_objects
+                    
+                    # Update last detection time
+                    self.last_detection_time[key] = current_time
+                    
+                    # Save event, merged with overlapping cameras' detections if grouped
+                    with self.profiler.span("save_detection_event"):
+                        self.correlator.submit(frame, camera_name, detection_type, objects)
                         
         except Exception as e:
-            logger.error(f"Error in object detection: {e}")
+            logger.error(f"Error in object detection: {e}", extra={"camera": camera_name, "stage": "detect_objects"})
     
-    def save_detection_event(self, frame, camera_name, detection_type, objects):
-        """Save detection event with annotated image."""
-        try:
-            # Create timestamped filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            event_dir = Path("events")
-            image_filename = f"{camera_name}_{detection_type}_{timestamp}.jpg"
-            image_path = event_dir / image_filename
+    def write_event_image(self, frame, image_path, objects):
+        """Write the frame with bounding boxes drawn for the detected objects."""
+        # Create annotated image
+        annotated_frame = frame.copy()
+        
+        # Draw bounding boxes
+        for obj in objects:
+            bbox = obj["bbox"]
+            conf = obj["confidence"]
+            class_name = obj["class"]
             
-            # Create annotated image
-            annotated_frame = frame.copy()
+            # Draw box
+            cv2.rectangle(annotated_frame, (bbox[0], bbox[1]), (bbox[2], bbox[3]), (0, 255, 0), 2)
             
-            # Draw bounding boxes
-            for obj in objects:
-                bbox = obj["bbox"]
-                conf = obj["confidence"]
-                class_name = obj["class"]
-                
-                # Draw box
-                cv2.rectangle(annotated_frame, (bbox[0], bbox[1]), (bbox[2], bbox[3]), (0, 255, 0), 2)
-                
-                # Add label
-                label = f"{class_name}: {conf:.2f}"
-                cv2.putText(
-                    annotated_frame, 
-                    label, 
-                    (bbox[0], bbox[1] - 10), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 
-                    0.5, 
-                    (0, 255, 0), 
-                    2
-                )
-            
-            # Save image
+            # Add label
+            label = f"{class_name}: {conf:.2f}"
+            cv2.putText(
+                annotated_frame, 
+                label, 
+                (bbox[0], bbox[1] - 10), 
+                cv2.FONT_HERSHEY_SIMPLEX, 
+                0.5, 
+                (0, 255, 0), 
+                2
+            )
+        
+        # Save image
+        with self.profiler.span("write_image"):
             cv2.imwrite(str(image_path), annotated_frame)
             
-            # Convert NumPy types to Python native types
-            serializable_objects = []
-            for obj in objects:
-                serializable_obj = {
-                    "confidence": float(obj["confidence"]),
-                    "class": str(obj["class"]),
-                    "bbox": [int(x) for x in obj["bbox"]]
-                }
-                serializable_objects.append(serializable_obj)
+    def serialize_objects(self, objects):
+        """Convert NumPy types to Python native types."""
+        serializable_objects = []
+        for obj in objects:
+            serializable_obj = {
+                "confidence": float(obj["confidence"]),
+                "class": str(obj["class"]),
+                "bbox": [int(x) for x in obj["bbox"]]
+            }
+            serializable_objects.append(serializable_obj)
+        return serializable_objects
+        
+    def publish_event(self, event_data, event_data_path):
+        """Send notifications for a saved event and forward it in cluster mode."""
+        camera_name = event_data["camera"]
+        
+        # Send notifications
+        try:
+            # Import email notifier (repo root is already on sys.path)
+            from notifications.email_notifier import EmailNotifier
+            
+            # Send email notification
+            with self.profiler.span("notify"):
+                email_notifier = EmailNotifier(self.config_path)
+                email_notifier.send_notification(event_data)
+        except Exception as e:
+            logger.error(f"Error sending notifications: {e}", extra={"camera": camera_name, "stage": "notify"})
+            
+        # Hand the event to the coordinator's central store in cluster mode
+        if self.node_client:
+            self.node_client.forward_event(event_data_path)
+    
+    def save_detection_event(self, frame, camera_name, detection_type, objects, timestamp=None):
+        """Save detection event with annotated image; returns the event data."""
+        save_start = time.time()
+        try:
+            # Create timestamped filename
+            timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+            event_dir = self.events_dir
+            image_filename = f"{camera_name}_{detection_type}_{timestamp}.jpg"
+            image_path = event_dir / image_filename
+            self.write_event_image(frame, image_path, objects)
+            self.suppressor.mark_reported(camera_name, objects)
             
             # Create event data
             event_data = {
@@ -240,7 +618,8 @@ class CameraAnalyzer:
                 "type": detection_type,
                 "timestamp": timestamp,
                 "image_path": str(image_path),
-                "objects": serializable_objects
+                "objects": self.serialize_objects(objects),
+                "suppressed_count": self.suppressor.pop_suppressed(camera_name, detection_type)
             }
             
             # Save event data
@@ -248,27 +627,78 @@ class CameraAnalyzer:
             with open(event_data_path, 'w') as f:
                 json.dump(event_data, f, indent=2)
                 
-            logger.info(f"Saved detection event: {camera_name} - {detection_type} - {timestamp}")
+            logger.info(f"Saved detection event: {camera_name} - {detection_type} - {timestamp}",
+                        extra={"camera": camera_name, "stage": "save_detection_event", "type": detection_type,
+                               "latency_ms": round((time.time() - save_start) * 1000, 1)})
             
             # Print detection notification to console
             print(f"DETECTION: {camera_name} - {detection_type} - {len(objects)} objects found")
             
-            # Send notifications
-            try:
-                # Import email notifier
-                import sys
-                sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-                from notifications.email_notifier import EmailNotifier
-                
-                # Send email notification
-                email_notifier = EmailNotifier(self.config_path)
-                email_notifier.send_notification(event_data)
-            except Exception as e:
-                logger.error(f"Error sending notifications: {e}")
+            self.publish_event(event_data, event_data_path)
+            return event_data
             
         except Exception as e:
-            logger.error(f"Error saving detection event: {e}")
-    
+            logger.error(f"Error saving detection event: {e}", extra={"camera": camera_name, "stage": "save_detection_event"})
+            return None
+            
+    def save_incident(self, incident):
+        """Attach the other cameras of a correlated incident to the event saved for its first detection."""
+        primary = incident["cameras"][0]
+        event_data = incident["event"]
+        if event_data is None:
+            logger.warning(f"Event for incident {incident['group']} - {incident['type']} was not saved, "
+                           f"dropping detections from {', '.join(incident['cameras'][1:])}")
+            return
+        
+        save_start = time.time()
+        detection_type = incident["type"]
+        timestamp = incident["timestamp"]
+        event_dir = self.events_dir
+        
+        # Other cameras follow in order of their most confident detection
+        others = [(c, m) for c, m in incident["members"].items() if c != primary]
+        ranked = sorted(others, key=lambda item: item[1]["score"], reverse=True)
+        image_paths = []
+        objects = [{**obj, "camera": primary} for obj in event_data["objects"]]
+        suppressed_count = event_data.get("suppressed_count", 0)
+        for camera_name, member in ranked:
+            image_path = event_dir / f"{camera_name}_{detection_type}_{timestamp}.jpg"
+            self.write_event_image(member["frame"], image_path, member["objects"])
+            self.suppressor.mark_reported(camera_name, member["objects"])
+            image_paths.append(str(image_path))
+            objects.extend({**obj, "camera": camera_name} for obj in self.serialize_objects(member["objects"]))
+            suppressed_count += self.suppressor.pop_suppressed(camera_name, detection_type)
+            
+        event_data = {
+            **event_data,
+            "image_paths": image_paths,
+            "objects": objects,
+            "suppressed_count": suppressed_count,
+            "incident": {
+                "group": incident["group"],
+                "cameras": incident["cameras"],
+                "events": incident["events"],
+                "duration": round(incident["end"] - incident["start"], 2)
+            }
+        }
+        
+        # Replace the saved event in one step so readers never see a partial file
+        event_data_path = event_dir / f"{primary}_{detection_type}_{timestamp}.json"
+        tmp_path = event_data_path.with_name(f".{event_data_path.name}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(event_data, f, indent=2)
+        os.replace(tmp_path, event_data_path)
+            
+        logger.info(f"Saved incident: {incident['group']} - {detection_type} - {timestamp} "
+                    f"({incident['events']} detections from {', '.join(incident['cameras'])})",
+                    extra={"camera": primary, "stage": "save_incident", "type": detection_type,
+                           "latency_ms": round((time.time() - save_start) * 1000, 1)})
+        print(f"DETECTION: {incident['group']} - {detection_type} - {len(incident['cameras'])} cameras")
+        
+        # The first detection was already notified; only update the central copy
+        if self.node_client:
+            self.node_client.forward_event(event_data_path)
+        
     def start(self):
         """Start processing all cameras."""
         if self.running:
@@ -276,20 +706,28 @@ class CameraAnalyzer:
             return
             
         self.running = True
-        self.threads = []
-        
-        # Start a thread for each camera
-        for camera in self.config.get("cameras", []):
-            if camera.get("enabled", True):
-                thread = threading.Thread(
-                    target=self.process_camera,
-                    args=(camera,),
-                    daemon=True
-                )
-                self.threads.append(thread)
-                thread.start()
+        
+        # Load the models only now that all state the loader touches is set up
+        if self.model_thread is None:
+            self.model_thread = threading.Thread(target=self.load_models_async, daemon=True)
+            self.model_thread.start()
+        
+        # Start a thread for each camera; streams open while the model loads.
+        # In cluster mode cameras are started as the coordinator assigns them.
+        if self.node_client:
+            self.node_client.start()
+        else:
+            for camera in self.active_cameras():
+                self.start_camera(camera)
+            
+
+        # Report readiness anyway if a camera never comes up
+        self.ready_timer = threading.Timer(self.ready_timeout, self.write_ready_file, kwargs={"timed_out": True})
+        self.ready_timer.daemon = True
+        self.ready_timer.start()
+        self.check_ready()
                 
-        logger.info(f"Started processing {len(self.threads)} cameras")
+        logger.info(f"Started processing {len(self.camera_threads)} cameras")
     
     def stop(self):
         """Stop all processing."""
@@ -299,25 +737,101 @@ class CameraAnalyzer:
             
         logger.info("Stopping camera analyzer...")
         self.running = False
+        self.profiler.stop()
+        if self.ready_timer:
+            self.ready_timer.cancel()
+        self.clear_ready_file()
         
         # Wait for threads to finish
-        for thread in self.threads:
-            thread.join(timeout=5.0)
+        for camera_name in list(self.camera_threads):
+            self.stop_camera(camera_name)
+            
+        # Save open incidents before the node client stops forwarding events
+        self.correlator.stop()
+        if self.node_client:
+            self.node_client.stop()
             
-        self.threads = []
         logger.info("Camera analyzer stopped")
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Camera Analyzer")
     parser.add_argument("--config", default="config/system.json", help="Path to configuration file")
+    parser.add_argument("--coordinator", help="Coordinator URL (e.g., http://127.0.0.1:9000) to run as a cluster node")
+    parser.add_argument("--node-id", default=socket.gethostname(), help="Node name reported to the coordinator")
+    parser.add_argument("--events-dir", help="Directory for saved events (defaults to spool/<node-id> in cluster mode)")
+    parser.add_argument("--batch", nargs="+", metavar="PATH", help="Re-analyze recorded video files or directories and exit")
+    parser.add_argument("--output-dir", help="Event output directory for --batch (defaults to reanalysis/<timestamp>)")
+    parser.add_argument("--fps", type=float, default=5, help="Frames per second of footage to analyze in --batch mode")
+    parser.add_argument("--workers", type=int, help="Worker processes for --batch mode")
+    parser.add_argument("--batch-size", type=int, default=8, help="Frames per inference batch in --batch mode")
+    parser.add_argument("--chunk-seconds", type=int, default=300, help="Seconds of footage per work unit in --batch mode")
+    parser.add_argument("--model", help="Model weights for --batch mode (defaults to models.default_weights)")
+    parser.add_argument("--input-size", type=int, help="Model input size for --batch mode (defaults to models.input_size)")
+    parser.add_argument("--confidence", type=float, help="Minimum confidence for --batch mode (defaults to detection.confidence)")
+    parser.add_argument("--cooldown", type=float, help="Seconds between events per type in --batch mode (defaults to detection.cooldown_seconds)")
     args = parser.parse_args()
     
-    analyzer = CameraAnalyzer(args.config)
+    if args.batch:
+        # Offline re-analysis runs as fast as the hardware allows and never
+        # touches the live event store or sends notifications
+        from batch_analyzer import run_batch
+        with open(args.config, 'r') as f:
+            config = json.load(f)
+        output_dir = args.output_dir or os.path.join("reanalysis", datetime.now().strftime("%Y%m%d_%H%M%S"))
+        summary = run_batch(
+            args.batch,
+            config,
+            output_dir,
+            CLASS_MAPPING,
+            fps=args.fps,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            chunk_seconds=args.chunk_seconds,
+            weights=args.model,
+            input_size=args.input_size,
+            confidence=args.confidence,
+            cooldown=args.cooldown
+        )
+        if summary:
+            print(json.dumps(summary, indent=2))
+        exit(0 if summary else 1)
+    
+    if args.coordinator:
+        events_dir = args.events_dir or os.path.join("spool", args.node_id)
+        analyzer = CameraAnalyzer(args.config, events_dir)
+        
+        # Cameras come from the coordinator instead of the local config
+        cluster_config = analyzer.config.get("cluster", {})
+        analyzer.node_client = NodeClient(
+            analyzer,
+            args.coordinator,
+            args.node_id,
+            cluster_config.get("heartbeat_interval", 5)
+        )
+        
+        # Keep per-node state files apart when several nodes share a machine
+        analyzer.ready_file = f"logs/analyzer_{args.node_id}.ready"
+        analyzer.profile_request_file = f"logs/profile_request_{args.node_id}.json"
+        analyzer.clear_ready_file()
+    else:
+        analyzer = CameraAnalyzer(args.config, args.events_dir or "events")
+    
+    # SIGUSR1 starts a profile described by the request file (or a default one)
+    signal.signal(signal.SIGUSR1, lambda signum, frame: analyzer.profiler.handle_request(analyzer.profile_request_file))
+    
     analyzer.start()
     
     try:
+        last_stats = time.time()
         while True:
             time.sleep(1)
+            if analyzer.model_error:
+                logger.error("Model failed to load, exiting")
+                analyzer.stop()
+                exit(1)
+            if analyzer.stats_interval and time.time() - last_stats >= analyzer.stats_interval:
+                last_stats = time.time()
+                analyzer.log_stats()
     except KeyboardInterrupt:
         analyzer.stop()
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+import time
+import logging
+import threading
+import cv2
+import numpy as np
+from static_suppression import iou
+from model_registry import ModelSpec
+
+logger = logging.getLogger("Cascade")
+
+class CropBatcher:
+    """Collects crops from all camera threads and runs them through one model call.
+
+    Callers block in submit() until their crops have been processed. A batch
+    is run as soon as `batch_size` crops are queued or the oldest request has
+    waited `max_wait` seconds.
+    """
+
+    def __init__(self, predict, batch_size=16, max_wait=0.02):
+        self.predict = predict
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.condition = threading.Condition()
+        self.pending = []
+        self.worker = threading.Thread(target=self.run, name="CascadeBatcher", daemon=True)
+        self.worker.start()
+
+    def submit(self, crops, timeout=5.0):
+        """Queue crops and wait for their results."""
+        if not crops:
+            return []
+        request = {"crops": crops, "results": None, "done": threading.Event(), "queued": time.time()}
+        with self.condition:
+            self.pending.append(request)
+            self.condition.notify()
+        if not request["done"].wait(timeout):
+            logger.warning("Cascade batch timed out")
+            return [[] for _ in crops]
+        return request["results"]
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+
+                # Give other cameras a moment to add crops to this batch
+                deadline = self.pending[0]["queued"] + self.max_wait
+                while sum(len(r["crops"]) for r in self.pending) < self.batch_size:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+
+                batch, count = [], 0
+                while self.pending and (not batch or count + len(self.pending[0]["crops"]) <= self.batch_size):
+                    request = self.pending.pop(0)
+                    batch.append(request)
+                    count += len(request["crops"])
+
+            crops = [crop for request in batch for crop in request["crops"]]
+            try:
+                results = self.predict(crops)
+            except Exception as e:
+                logger.error(f"Error in cascade inference: {e}")
+                results = [[] for _ in crops]
+
+            offset = 0
+            for request in batch:
+                request["results"] = results[offset:offset + len(request["crops"])]
+                offset += len(request["crops"])
+                request["done"].set()
+
+def relative_objects(objects, box):
+    """Express object boxes as fractions of the enclosing track box."""
+    x1, y1, x2, y2 = box
+    w, h = max(1, x2 - x1), max(1, y2 - y1)
+    return [
+        {**obj, "bbox": [(obj["bbox"][0] - x1) / w, (obj["bbox"][1] - y1) / h,
+                         (obj["bbox"][2] - x1) / w, (obj["bbox"][3] - y1) / h]}
+        for obj in objects
+    ]
+
+def place_objects(objects, box):
+    """Map relative object boxes onto the track's current box."""
+    x1, y1, x2, y2 = box
+    w, h = x2 - x1, y2 - y1
+    return [
+        {**obj, "bbox": [int(x1 + obj["bbox"][0] * w), int(y1 + obj["bbox"][1] * h),
+                         int(x1 + obj["bbox"][2] * w), int(y1 + obj["bbox"][3] * h)]}
+        for obj in objects
+    ]
+
+class TrackCache:
+    """Short-lived per-camera tracks (by box overlap) with cached cascade results.
+
+    A positive result is kept for the life of the track; a negative result is
+    re-checked after `recheck_seconds`. This makes cascade cost scale with
+    new detections rather than with frames. Results are stored relative to
+    the track box (see `relative_objects`) so they follow the track as it moves.
+    """
+
+    def __init__(self, ttl=5.0, iou_threshold=0.4, recheck_seconds=2.0):
+        self.ttl = ttl
+        self.iou_threshold = iou_threshold
+        self.recheck_seconds = recheck_seconds
+        self.lock = threading.Lock()
+        self.tracks = {}
+        self.next_id = 0
+
+    def assign(self, camera_name, boxes, now):
+        """Match boxes to existing tracks, creating new ones as needed."""
+        with self.lock:
+            tracks = self.tracks.setdefault(camera_name, {})
+            for track_id in [t for t, track in tracks.items() if now - track["last_seen"] > self.ttl]:
+                del tracks[track_id]
+
+            track_ids = []
+            used = set()
+            for box in boxes:
+                best_id, best_iou = None, self.iou_threshold
+                for track_id, track in tracks.items():
+                    if track_id in used:
+                        continue
+                    overlap = iou(track["bbox"], box)
+                    if overlap >= best_iou:
+                        best_id, best_iou = track_id, overlap
+
+                if best_id is None:
+                    best_id = self.next_id
+                    self.next_id += 1
+                    tracks[best_id] = {"result": None, "checked": 0}
+                tracks[best_id]["bbox"] = list(box)
+                tracks[best_id]["last_seen"] = now
+                used.add(best_id)
+                track_ids.append(best_id)
+            return track_ids
+
+    def get(self, camera_name, track_id, now):
+        """Cached result for a track, or None if it needs (re)checking."""
+        with self.lock:
+            track = self.tracks.get(camera_name, {}).get(track_id)
+            if track is None or track["result"] is None:
+                return None
+            if not track["result"] and now - track["checked"] >= self.recheck_seconds:
+                return None
+            return track["result"]
+
+    def put(self, camera_name, track_id, result, now):
+        with self.lock:
+            track = self.tracks.get(camera_name, {}).get(track_id)
+            if track is not None:
+                track["result"] = result
+                track["checked"] = now
+
+class CascadeDetector:
+    """Second-stage face and fire/smoke detection on regions of interest only.
+
+    Faces are searched for in person crops from the main model. Fire and
+    smoke are searched for in regions that are both fire-coloured and
+    changing between frames. Each stage uses a YOLO model given by its
+    `weights` setting, batched across cameras. Without weights, faces fall
+    back to a Haar cascade; fire detection is skipped unless the colour
+    ratio heuristic is enabled with `fire.heuristic`, since it also matches
+    orange clothing and brake lights. Models come from the analyzer's
+    shared `registry` when given.
+    """
+
+    def __init__(self, config=None, registry=None):
+        config = config or {}
+        self.registry = registry
+        self.face_config = config.get("face", {})
+        self.fire_config = config.get("fire", {})
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.face_batcher = None
+        self.fire_batcher = None
+        self.prev_gray = {}
+        self.fire_disabled_warned = False
+
+        track_config = config.get("tracks", {})
+        self.face_tracks = TrackCache(
+            track_config.get("ttl_seconds", 5.0),
+            track_config.get("iou_threshold", 0.4),
+            track_config.get("recheck_seconds", 2.0)
+        )
+        self.fire_tracks = TrackCache(
+            track_config.get("ttl_seconds", 5.0),
+            track_config.get("iou_threshold", 0.4),
+            track_config.get("recheck_seconds", 2.0)
+        )
+
+    def yolo_batcher(self, stage_config, labels):
+        """Build a cross-camera batcher around a YOLO model for the given labels."""
+        imgsz = stage_config.get("input_size", 160)
+        min_conf = stage_config.get("confidence", 0.5)
+        if self.registry is not None:
+            spec = ModelSpec(stage_config["weights"], stage_config.get("backend", "pytorch"), imgsz)
+            infer = lambda crops: self.registry.predict(spec, crops)
+        else:
+            from ultralytics import YOLO
+            model = YOLO(stage_config["weights"])
+            infer = lambda crops: model(crops, imgsz=imgsz, verbose=False)
+
+        def predict(crops):
+            results = infer(crops)
+            found = []
+            for result in results:
+                objects = []
+                for box in result.boxes:
+                    class_name = result.names[int(box.cls[0])]
+                    confidence = float(box.conf[0])
+                    if confidence < min_conf or not any(l in class_name.lower() for l in labels):
+                        continue
+                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
+                    objects.append({"confidence": confidence, "bbox": [x1, y1, x2, y2], "class": class_name})
+                found.append(objects)
+            return found
+
+        return CropBatcher(predict, stage_config.get("batch_size", 16), stage_config.get("max_wait_ms", 20) / 1000.0)
+
+    def run_face_model(self, crops):
+        """Detect faces in crops with the configured model or a Haar cascade."""
+        if self.face_config.get("weights"):
+            with self.lock:
+                if self.face_batcher is None:
+                    self.face_batcher = self.yolo_batcher(self.face_config, ["face"])
+            return self.face_batcher.submit(crops)
+
+        # CascadeClassifier is not thread-safe, keep one per camera thread
+        classifier = getattr(self.local, "face_classifier", None)
+        if classifier is None:
+            classifier = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+            self.local.face_classifier = classifier
+
+        found = []
+        for crop in crops:
+            gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+            faces = classifier.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(20, 20))
+            found.append([
+                {"confidence": 1.0, "bbox": [int(x), int(y), int(x + w), int(y + h)], "class": "face"}
+                for (x, y, w, h) in faces
+            ])
+        return found
+
+    def detect_faces(self, frame, camera_name, person_boxes, now=None):
+        """Find faces within person boxes, reusing cached results per person track."""
+        now = now or time.time()
+        track_ids = self.face_tracks.assign(camera_name, person_boxes, now)
+
+        faces, pending = [], []
+        for box, track_id in zip(person_boxes, track_ids):
+            cached = self.face_tracks.get(camera_name, track_id, now)
+            if cached is not None:
+                faces.extend(place_objects(cached, box))
+                continue
+
+            # Faces are in the upper part of a person box
+            x1, y1, x2, y2 = [int(v) for v in box]
+            y2 = y1 + max(1, int((y2 - y1) * 0.6))
+            crop = frame[max(0, y1):y2, max(0, x1):x2]
+            if crop.size == 0:
+                continue
+            pending.append((track_id, box, max(0, x1), max(0, y1), crop))
+
+        results = self.run_face_model([crop for _, _, _, _, crop in pending])
+        for (track_id, box, ox, oy, _), objects in zip(pending, results):
+            # Map crop coordinates back to the frame
+            mapped = [
+                {**obj, "class": "face", "bbox": [obj["bbox"][0] + ox, obj["bbox"][1] + oy,
+                                                  obj["bbox"][2] + ox, obj["bbox"][3] + oy]}
+                for obj in objects
+            ]
+            self.face_tracks.put(camera_name, track_id, relative_objects(mapped, box), now)
+            faces.extend(mapped)
+        return faces
+
+    def fire_candidates(self, frame, camera_name):
+        """Boxes of regions that are fire-coloured and changing between frames."""
+        scale = 320.0 / frame.shape[1]
+        small = cv2.resize(frame, (320, max(1, int(frame.shape[0] * scale))), interpolation=cv2.INTER_AREA)
+        hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+        color_mask = cv2.inRange(hsv, (0, 120, 150), (35, 255, 255))
+
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        prev_gray = self.prev_gray.get(camera_name)
+        self.prev_gray[camera_name] = gray
+        if prev_gray is None or prev_gray.shape != gray.shape:
+            return [], color_mask, scale
+
+        # Flames and smoke flicker, so require motion as well as colour
+        motion_mask = cv2.threshold(cv2.absdiff(gray, prev_gray), 25, 255, cv2.THRESH_BINARY)[1]
+        motion_mask = cv2.dilate(motion_mask, None, iterations=2)
+        mask = cv2.bitwise_and(color_mask, motion_mask)
+
+        min_area = self.fire_config.get("min_area_fraction", 0.001) * mask.shape[0] * mask.shape[1]
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        boxes = []
+        for contour in contours:
+            if cv2.contourArea(contour) < min_area:
+                continue
+            x, y, w, h = cv2.boundingRect(contour)
+            boxes.append([x, y, x + w, y + h])
+        return boxes, color_mask, scale
+
+    def detect_fire(self, frame, camera_name, now=None):
+        """Find fire/smoke in candidate regions, reusing cached results per region track."""
+        if not self.fire_config.get("weights") and not self.fire_config.get("heuristic", False):
+            if not self.fire_disabled_warned:
+                self.fire_disabled_warned = True
+                logger.warning("Fire detection is enabled for a camera but cascade.fire.weights is not set; "
+                               "skipping it (set cascade.fire.heuristic to use the colour heuristic)")
+            return []
+
+        now = now or time.time()
+        small_boxes, color_mask, scale = self.fire_candidates(frame, camera_name)
+        boxes = [[int(v / scale) for v in box] for box in small_boxes]
+        track_ids = self.fire_tracks.assign(camera_name, boxes, now)
+
+        fires, pending = [], []
+        for small_box, box, track_id in zip(small_boxes, boxes, track_ids):
+            cached = self.fire_tracks.get(camera_name, track_id, now)
+            if cached is not None:
+                fires.extend(place_objects(cached, box))
+                continue
+            pending.append((track_id, small_box, box))
+
+        if self.fire_config.get("weights"):
+            with self.lock:
+                if self.fire_batcher is None:
+                    self.fire_batcher = self.yolo_batcher(self.fire_config, ["fire", "smoke", "flame"])
+            crops = [frame[box[1]:box[3], box[0]:box[2]] for _, _, box in pending]
+            results = self.fire_batcher.submit(crops)
+            results = [
+                [{**obj, "bbox": [obj["bbox"][0] + box[0], obj["bbox"][1] + box[1],
+                                  obj["bbox"][2] + box[0], obj["bbox"][3] + box[1]]} for obj in objects]
+                for (_, _, box), objects in zip(pending, results)
+            ]
+        else:
+            # Opt-in heuristic without a model: accept regions that are mostly fire-coloured
+            min_ratio = self.fire_config.get("color_ratio", 0.4)
+            results = []
+            for _, small_box, box in pending:
+                region = color_mask[small_box[1]:small_box[3], small_box[0]:small_box[2]]
+                ratio = float(np.count_nonzero(region)) / max(1, region.size)
+                results.append([{"confidence": ratio, "bbox": box, "class": "fire"}] if ratio >= min_ratio else [])
+
+        for (track_id, _, box), objects in zip(pending, results):
+            self.fire_tracks.put(camera_name, track_id, relative_objects(objects, box), now)
+            fires.extend(objects)
+        return fires
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+import time
+import heapq
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger("EventCorrelator")
+
+class EventCorrelator:
+    """Merges detections from overlapping cameras into a single incident.
+
+    Cameras are grouped in the "correlation" config section. The first
+    detection of a type in a group is saved and notified right away through
+    `save_event`, and opens an incident; detections of the same type from
+    the group's other cameras during the next `window_seconds` join it. Only
+    the highest-confidence frame per other camera is kept, for at most
+    `max_images` cameras. When the window closes with other cameras in it,
+    `save_incident` is called once from the correlator thread to attach them
+    to the saved event. Detections from ungrouped cameras go straight to
+    `save_event`.
+    """
+
+    def __init__(self, config, save_event, save_incident):
+        config = config or {}
+        self.window = config.get("window_seconds", 10)
+        self.max_images = config.get("max_images", 4)
+        self.save_event = save_event
+        self.save_incident = save_incident
+
+        self.groups = {}
+        for group in config.get("groups", []):
+            for camera_name in group.get("cameras", []):
+                self.groups[camera_name] = group.get("name", "group")
+        self.enabled = config.get("enabled", True) and bool(self.groups)
+
+        # Open incidents by (group, type), and their close times in time order
+        self.condition = threading.Condition()
+        self.incidents = {}
+        self.deadlines = []
+        self.sequence = 0
+        self.running = True
+        self.merged = 0
+        self.worker = None
+        if self.enabled:
+            self.worker = threading.Thread(target=self.run, name="EventCorrelator", daemon=True)
+            self.worker.start()
+
+    def submit(self, frame, camera_name, detection_type, objects):
+        """Hand over a detection; only the first of an incident is saved by the caller's thread."""
+        group = self.groups.get(camera_name) if self.enabled else None
+        if group is None:
+            self.save_event(frame, camera_name, detection_type, objects)
+            return
+
+        now = time.time()
+        score = max((float(obj["confidence"]) for obj in objects), default=0.0)
+        key = (group, detection_type)
+        with self.condition:
+            incident = self.incidents.get(key)
+            first = incident is None
+            if first:
+                self.sequence += 1
+                incident = {
+                    "id": self.sequence,
+                    "group": group,
+                    "type": detection_type,
+                    "start": now,
+                    "end": now,
+                    "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
+                    "cameras": [],
+                    "members": {},
+                    "events": 0,
+                    "event": None
+                }
+                self.incidents[key] = incident
+                heapq.heappush(self.deadlines, (now + self.window, incident["id"], key))
+                self.condition.notify()
+            else:
+                self.merged += 1
+
+            incident["events"] += 1
+            incident["end"] = now
+            if camera_name not in incident["cameras"]:
+                incident["cameras"].append(camera_name)
+
+            # Keep the best frame per camera; the first camera's is already saved
+            member = incident["members"].get(camera_name)
+            if member is not None and camera_name == incident["cameras"][0]:
+                return
+            if member is None and len(incident["members"]) < self.max_images:
+                incident["members"][camera_name] = {"frame": frame, "objects": objects, "score": score, "time": now}
+            elif member is not None and score > member["score"]:
+                member.update(frame=frame, objects=objects, score=score, time=now)
+
+        if first:
+            event = self.save_event(frame, camera_name, detection_type, objects, incident["timestamp"])
+            with self.condition:
+                incident["event"] = event
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and (not self.deadlines or self.deadlines[0][0] > time.time()):
+                    timeout = self.deadlines[0][0] - time.time() if self.deadlines else None
+                    self.condition.wait(timeout)
+                if not self.running:
+                    return
+                _, incident_id, key = heapq.heappop(self.deadlines)
+                incident = self.incidents.get(key)
+                if incident is None or incident["id"] != incident_id:
+                    continue
+                del self.incidents[key]
+
+            self.close(incident)
+
+    def close(self, incident):
+        # Nothing to add when only the first camera saw it
+        if len(incident["members"]) < 2:
+            return
+        try:
+            self.save_incident(incident)
+        except Exception as e:
+            logger.error(f"Error saving incident {incident['group']} - {incident['type']}: {e}")
+
+    def stop(self):
+        """Save incidents that are still open and stop the correlator thread."""
+        with self.condition:
+            self.running = False
+            pending = list(self.incidents.values())
+            self.incidents.clear()
+            self.deadlines.clear()
+            self.condition.notify()
+        if self.worker:
+            self.worker.join(timeout=5)
+        for incident in pending:
+            self.close(incident)
+
+    def stats(self):
+        with self.condition:
+            return {"open_incidents": len(self.incidents), "merged_events": self.merged}
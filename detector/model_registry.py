@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+
+logger = logging.getLogger("ModelRegistry")
+
+# Formats ultralytics can export to and load back for inference
+EXPORT_BACKENDS = {"onnx", "openvino", "torchscript", "engine", "ncnn"}
+
+class ModelSpec(tuple):
+    """Identifies a loaded model: (weights, backend, input_size)."""
+
+    def __new__(cls, weights, backend="pytorch", input_size=640):
+        return super().__new__(cls, (weights, backend or "pytorch", int(input_size or 640)))
+
+    @property
+    def weights(self):
+        return self[0]
+
+    @property
+    def backend(self):
+        return self[1]
+
+    @property
+    def input_size(self):
+        return self[2]
+
+    def __repr__(self):
+        return f"{self.weights}[{self.backend}@{self.input_size}]"
+
+class ModelEntry:
+    """A loaded model with its own inference lock and usage bookkeeping."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.model = None
+        self.error = None
+        self.loaded = threading.Event()
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.memory = 0
+        self.last_used = time.time()
+        self.inferences = 0
+
+class ModelRegistry:
+    """Loads each distinct model once and shares it between cameras.
+
+    Models are keyed by weights, backend and input size. Inference on a model
+    is serialized by a per-model lock since ultralytics predictors are not
+    thread-safe. When the estimated memory of loaded models exceeds
+    `memory_cap_mb`, the least recently used models that have been idle for
+    `min_idle_seconds` are unloaded; they are loaded again on their next use.
+    Models still in active use are never unloaded, so the cap can be
+    exceeded when every loaded model is busy.
+    """
+
+    def __init__(self, memory_cap_mb=1024, min_idle_seconds=60):
+        self.memory_cap = memory_cap_mb * 1024 * 1024
+        self.min_idle = min_idle_seconds
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.memory = 0
+        self.over_cap_warned = False
+        self.loads = 0
+        self.evictions = 0
+
+    def get_entry(self, spec):
+        """Return the entry for `spec`, loading it if needed, and mark it in use."""
+        with self.lock:
+            entry = self.entries.get(spec)
+            if entry is None or entry.error is not None:
+                entry = ModelEntry(spec)
+                self.entries[spec] = entry
+                load = True
+            else:
+                load = False
+            self.entries.move_to_end(spec)
+            entry.in_use += 1
+
+        if load:
+            try:
+                self.load(entry)
+            except Exception as e:
+                entry.error = e
+                with self.lock:
+                    entry.in_use -= 1
+                    if self.entries.get(spec) is entry:
+                        del self.entries[spec]
+                entry.loaded.set()
+                raise
+            with self.lock:
+                self.memory += entry.memory
+            entry.loaded.set()
+            self.evict()
+        else:
+            entry.loaded.wait()
+            if entry.error is not None:
+                with self.lock:
+                    entry.in_use -= 1
+                raise entry.error
+        return entry
+
+    def release(self, entry):
+        with self.lock:
+            entry.in_use -= 1
+            entry.last_used = time.time()
+            over_cap = self.memory > self.memory_cap
+        if over_cap:
+            self.evict()
+
+    def load(self, entry):
+        """Load (exporting first for non-PyTorch backends) and warm up a model."""
+        from ultralytics import YOLO
+
+        spec = entry.spec
+        start = time.time()
+        weights = spec.weights
+        if spec.backend in EXPORT_BACKENDS and weights.endswith(".pt"):
+            # Export once; the exported file is reused on later runs
+            weights = self.exported_path(spec)
+            if not os.path.exists(weights):
+                logger.info(f"Exporting {spec.weights} to {spec.backend}")
+                weights = YOLO(spec.weights).export(format=spec.backend, imgsz=spec.input_size)
+        elif spec.backend != "pytorch" and spec.backend not in EXPORT_BACKENDS:
+            logger.warning(f"Unknown model backend {spec.backend}, loading {weights} as is")
+
+        entry.model = YOLO(weights, task="detect")
+        entry.memory = self.estimate_memory(entry.model, weights, spec.input_size)
+
+        # Warm up at the configured size so the first real frame is not slowed down
+        dummy = np.zeros((spec.input_size, spec.input_size, 3), dtype=np.uint8)
+        entry.model(dummy, imgsz=spec.input_size, verbose=False)
+
+        self.loads += 1
+        logger.info(f"Loaded model {spec} in {time.time() - start:.1f}s "
+                    f"(~{entry.memory / 1024 / 1024:.0f} MB)")
+
+    def exported_path(self, spec):
+        """Path ultralytics writes the export of `spec.weights` to."""
+        base = os.path.splitext(spec.weights)[0]
+        suffix = {
+            "onnx": ".onnx",
+            "torchscript": ".torchscript",
+            "engine": ".engine",
+            "openvino": "_openvino_model",
+            "ncnn": "_ncnn_model",
+        }[spec.backend]
+        return base + suffix
+
+    def estimate_memory(self, model, weights, input_size):
+        """Rough resident size: parameters plus feature maps at the input size."""
+        try:
+            params = sum(p.numel() * p.element_size() for p in model.model.parameters())
+        except Exception:
+            params = os.path.getsize(weights) if os.path.isfile(weights) else 0
+        # Feature maps scale with input area; ~256 bytes per input pixel covers
+        # the YOLOv8 backbone and head activations at batch size 1
+        activations = input_size * input_size * 256
+        return params * 2 + activations
+
+    def evict(self):
+        """Unload least recently used idle models until under the memory cap."""
+        now = time.time()
+        with self.lock:
+            for spec, entry in list(self.entries.items()):
+                if self.memory <= self.memory_cap:
+                    self.over_cap_warned = False
+                    return
+                # Keep models that are loading, running or recently used
+                if entry.in_use or not entry.loaded.is_set() or now - entry.last_used < self.min_idle:
+                    continue
+                del self.entries[spec]
+                self.memory -= entry.memory
+                self.evictions += 1
+                logger.info(f"Evicted model {spec} (idle {now - entry.last_used:.0f}s)")
+
+            if self.memory > self.memory_cap and not self.over_cap_warned:
+                self.over_cap_warned = True
+                logger.warning(f"Models in use need ~{self.memory / 1024 / 1024:.0f} MB, "
+                               f"above the {self.memory_cap / 1024 / 1024:.0f} MB cap")
+
+    def preload(self, specs):
+        """Load models ahead of first use; errors are logged, not raised."""
+        for spec in specs:
+            try:
+                self.release(self.get_entry(spec))
+            except Exception as e:
+                logger.error(f"Error loading model {spec}: {e}")
+
+    def predict(self, spec, source, **kwargs):
+        """Run inference with the shared model for `spec`."""
+        entry = self.get_entry(spec)
+        try:
+            with entry.lock:
+                entry.inferences += 1
+                return entry.model(source, imgsz=spec.input_size, verbose=False, **kwargs)
+        finally:
+            self.release(entry)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "models": [
+                    {
+                        "model": repr(spec),
+                        "memory_mb": round(entry.memory / 1024 / 1024, 1),
+                        "in_use": entry.in_use,
+                        "inferences": entry.inferences,
+                        "idle_seconds": round(time.time() - entry.last_used, 1)
+                    }
+                    for spec, entry in self.entries.items()
+                ],
+                "memory_mb": round(self.memory / 1024 / 1024, 1),
+                "memory_cap_mb": round(self.memory_cap / 1024 / 1024, 1),
+                "loads": self.loads,
+                "evictions": self.evictions
+            }
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import queue
+import base64
+import logging
+import threading
+import urllib.request
+from pathlib import Path
+
+logger = logging.getLogger("NodeClient")
+
+class NodeClient:
+    """Connects a camera analyzer to a coordinator.
+
+    A heartbeat thread reports measured capacity and load and applies the
+    camera assignment returned by the coordinator. Saved events are queued
+    and forwarded to the coordinator's central store; local copies are
+    removed once the coordinator has accepted them, so events survive a
+    coordinator outage.
+    """
+
+    def __init__(self, analyzer, coordinator_url, node_id, heartbeat_interval=5):
+        self.analyzer = analyzer
+        self.coordinator_url = coordinator_url.rstrip("/")
+        self.node_id = node_id
+        self.heartbeat_interval = heartbeat_interval
+        self.events = queue.Queue()
+        self.running = False
+        self.threads = []
+
+    def post(self, path, data, timeout=10):
+        """POST JSON to the coordinator and return the decoded response."""
+        request = urllib.request.Request(
+            f"{self.coordinator_url}{path}",
+            data=json.dumps(data).encode(),
+            headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.load(response)
+
+    def start(self):
+        """Start heartbeating and forwarding events."""
+        self.running = True
+
+        # Forward events left over from a previous run
+        for event_path in sorted(Path(self.analyzer.events_dir).glob("*.json")):
+            self.events.put(event_path)
+
+        for target in (self.heartbeat_loop, self.forward_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            self.threads.append(thread)
+            thread.start()
+        logger.info(f"Node {self.node_id} reporting to {self.coordinator_url}")
+
+    def stop(self):
+        """Stop the client threads."""
+        self.running = False
+        self.events.put(None)
+        for thread in self.threads:
+            thread.join(timeout=5.0)
+        self.threads = []
+
+    def heartbeat_loop(self):
+        """Report node state and apply camera assignments."""
+        while self.running:
+            try:
+                report = self.analyzer.node_report()
+                report["node_id"] = self.node_id
+                response = self.post("/heartbeat", report)
+                self.analyzer.apply_assignment(response.get("cameras", []))
+            except Exception as e:
+                logger.warning(f"Heartbeat to coordinator failed: {e}")
+            time.sleep(self.heartbeat_interval)
+
+    def forward_event(self, event_data_path):
+        """Queue a saved event for delivery to the coordinator."""
+        self.events.put(Path(event_data_path))
+
+    def forward_loop(self):
+        """Deliver queued events, retrying while the coordinator is unreachable."""
+        while self.running:
+            event_data_path = self.events.get()
+            if event_data_path is None:
+                break
+            try:
+                with open(event_data_path, 'r') as f:
+                    event_data = json.load(f)
+                event_data["node"] = self.node_id
+
+                image_path = Path(self.analyzer.events_dir) / os.path.basename(event_data.get("image_path", ""))
+                image = None
+                if image_path.is_file():
+                    with open(image_path, 'rb') as f:
+                        image = base64.b64encode(f.read()).decode()
+
+                # Incidents have an image for each additional camera
+                extra_paths = [Path(self.analyzer.events_dir) / os.path.basename(p) for p in event_data.get("image_paths", [])]
+                images = []
+                for path in extra_paths:
+                    if path.is_file():
+                        with open(path, 'rb') as f:
+                            images.append({"name": path.name, "image": base64.b64encode(f.read()).decode()})
+
+                self.post("/events", {"event": event_data, "image_name": image_path.name, "image": image, "images": images})
+
+                # Delivered: the central store now owns the event
+                os.remove(event_data_path)
+                for path in [image_path] + extra_paths:
+                    if path.is_file():
+                        os.remove(path)
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                logger.warning(f"Failed to forward event {event_data_path.name}: {e}")
+                self.events.put(event_data_path)
+                time.sleep(self.heartbeat_interval)
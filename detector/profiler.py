@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from collections import Counter, defaultdict
+
+logger = logging.getLogger("Profiler")
+
+class _NullSpan:
+    """Shared no-op context manager returned while profiling is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    """Times one stage and records it under the current thread's span stack."""
+
+    def __init__(self, profiler, stage):
+        self.profiler = profiler
+        self.stage = stage
+
+    def __enter__(self):
+        stack = self.profiler._stack()
+        parent_path = stack[-1].path if stack else threading.current_thread().name
+        self.path = f"{parent_path};{self.stage}"
+        self.child_time = 0.0
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stack = self.profiler._stack()
+        stack.pop()
+        if stack:
+            stack[-1].child_time += elapsed
+        # Folded stacks carry self time so flamegraph widths add up
+        self.profiler._record(self.stage, self.path, elapsed, elapsed - self.child_time)
+        return False
+
+class AnalyzerProfiler:
+    """Time-bounded, runtime-toggleable profiler for the camera analyzer.
+
+    Two modes are supported:
+      - "sampling": a background thread samples the stacks of all threads
+        at a fixed interval (wall-clock, so blocking I/O shows up).
+      - "stages": explicit spans around pipeline stages record durations.
+
+    Both write a collapsed-stack file (flamegraph.pl / speedscope format)
+    and a JSON per-stage summary to the output directory. While no profile
+    is active, span() returns a shared no-op object.
+    """
+
+    # Analyzer functions reported in the sampling summary
+    SAMPLED_STAGES = ("process_camera", "detect_objects", "save_detection_event", "send_notification")
+
+    def __init__(self, output_dir="logs/profiles"):
+        self.output_dir = output_dir
+        self.active = False
+        self.mode = None
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.timer = None
+
+    def span(self, stage):
+        """Context manager timing a pipeline stage when stage profiling is active."""
+        if not self.active or self.mode != "stages":
+            return _NULL_SPAN
+        return _Span(self, stage)
+
+    def _stack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def _record(self, stage, path, elapsed, self_time):
+        with self.lock:
+            if not self.active:
+                return
+            self.durations[stage].append(elapsed)
+            self.folded[path] += int(self_time * 1e6)
+
+    def start(self, mode="stages", duration=30, interval=0.01):
+        """Start a profile that stops itself after `duration` seconds."""
+        if mode not in ("stages", "sampling"):
+            logger.error(f"Unknown profiling mode: {mode}")
+            return False
+
+        with self.lock:
+            if self.active:
+                logger.warning("A profile is already running")
+                return False
+            self.mode = mode
+            self.duration = duration
+            self.durations = defaultdict(list)
+            self.folded = Counter()
+            self.samples = 0
+            self.thread_samples = 0
+            self.stage_samples = Counter()
+            self.started_at = time.time()
+            self.active = True
+
+        if mode == "sampling":
+            sampler = threading.Thread(target=self._sample, args=(interval,), name="ProfilerSampler", daemon=True)
+            sampler.start()
+
+        self.timer = threading.Timer(duration, self.stop)
+        self.timer.daemon = True
+        self.timer.start()
+        logger.info(f"Started {mode} profile for {duration}s")
+        return True
+
+    def _sample(self, interval):
+        """Collect wall-clock stack samples from every other thread."""
+        own_id = threading.get_ident()
+        names = {}
+        while self.active:
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            frames = sys._current_frames()
+            with self.lock:
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    stack = []
+                    stages = set()
+                    while frame is not None:
+                        code = frame.f_code
+                        # Label by function, not current line, so samples of one call fold together
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                        if code.co_name in self.SAMPLED_STAGES:
+                            stages.add(code.co_name)
+                        frame = frame.f_back
+                    stack.append(names.get(thread_id, str(thread_id)))
+                    self.folded[";".join(reversed(stack))] += 1
+                    self.thread_samples += 1
+
+                    # Count the sample once for each enclosing stage
+                    for stage in stages:
+                        self.stage_samples[stage] += 1
+                self.samples += 1
+            time.sleep(interval)
+
+    def stop(self):
+        """Stop the running profile and write its output files."""
+        with self.lock:
+            if not self.active:
+                return None
+            self.active = False
+            if self.timer:
+                self.timer.cancel()
+            elapsed = time.time() - self.started_at
+            folded = dict(self.folded)
+            durations = {stage: list(values) for stage, values in self.durations.items()}
+            samples = self.samples
+            thread_samples = self.thread_samples
+            stage_samples = dict(self.stage_samples)
+        return self.write_output(folded, durations, elapsed, samples, thread_samples, stage_samples)
+
+    def write_output(self, folded, durations, elapsed, samples, thread_samples=0, stage_samples=None):
+        """Write the collapsed stacks and per-stage summary.
+
+        Sampling profiles have no per-call durations; their stages report the
+        number of thread samples inside the stage and that count's share of
+        all thread samples, i.e. the share of sampled wall time.
+        """
+        summary = {
+            "mode": self.mode,
+            "duration_seconds": round(elapsed, 3),
+            "samples": samples,
+            "folded_units": "samples" if self.mode == "sampling" else "microseconds",
+            "stages": {}
+        }
+        if self.mode == "sampling":
+            summary["thread_samples"] = thread_samples
+            # Achieved rate; sampling all threads takes time, so it is slower than requested
+            summary["sample_interval_ms"] = round(elapsed / samples * 1000, 3) if samples else None
+            for stage, count in (stage_samples or {}).items():
+                summary["stages"][stage] = {
+                    "samples": count,
+                    "wall_share": round(count / thread_samples, 4) if thread_samples else None
+                }
+        for stage, values in durations.items():
+            values.sort()
+            count = len(values)
+            summary["stages"][stage] = {
+                "count": count,
+                "total_ms": round(sum(values) * 1000, 3),
+                "mean_ms": round(sum(values) / count * 1000, 3),
+                "p50_ms": round(values[count // 2] * 1000, 3),
+                "p95_ms": round(values[min(count - 1, int(count * 0.95))] * 1000, 3),
+                "max_ms": round(values[-1] * 1000, 3),
+            }
+
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            base = os.path.join(self.output_dir, f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self.mode}")
+            with open(f"{base}.folded", 'w') as f:
+                for path, weight in sorted(folded.items()):
+                    f.write(f"{path} {weight}\n")
+            with open(f"{base}_summary.json", 'w') as f:
+                json.dump(summary, f, indent=2)
+            logger.info(f"Wrote profile to {base}.folded")
+        except Exception as e:
+            logger.error(f"Error writing profile: {e}")
+        return summary
+
+    def handle_request(self, request_file):
+        """Start a profile as described by a request file (used by the signal handler)."""
+        request = {}
+        try:
+            with open(request_file, 'r') as f:
+                request = json.load(f)
+            os.remove(request_file)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error reading profile request: {e}")
+        return self.start(request.get("mode", "stages"), float(request.get("duration", 30)))
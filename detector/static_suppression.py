@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+import time
+import logging
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+logger = logging.getLogger("StaticSuppression")
+
+def dhash(image, hash_size=8):
+    """Compute a 64-bit difference hash of an image crop."""
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    resized = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (resized[:, 1:] > resized[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def hamming(a, b):
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count("1")
+
+def iou(a, b):
+    """Intersection over union of two [x1, y1, x2, y2] boxes."""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+class StaticObjectSuppressor:
+    """Suppress events for objects that have sat unchanged in the same place.
+
+    Each camera keeps a bounded LRU cache of recent object signatures
+    (class, box and perceptual hash of the crop). An object is suppressed
+    only once it has appeared in a saved event and a matching signature has
+    since been seen continuously for `min_stationary_seconds`; objects that
+    have never been reported always pass. Events made up only of suppressed
+    objects are dropped and counted.
+    """
+
+    # Approximate size of one cached signature, used to apply the memory cap
+    SIGNATURE_BYTES = 256
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.enabled = config.get("enabled", True)
+        self.ttl = config.get("ttl_seconds", 300)
+        self.min_stationary = config.get("min_stationary_seconds", 30)
+        self.hamming_threshold = config.get("hamming_threshold", 6)
+        self.iou_threshold = config.get("iou_threshold", 0.8)
+        max_memory_kb = config.get("max_memory_kb", 256)
+        self.max_entries = max(1, max_memory_kb * 1024 // self.SIGNATURE_BYTES)
+
+        self.lock = threading.Lock()
+        self.caches = {}
+        self.suppressed = {}
+        self.suppressed_total = {}
+
+    def _match(self, cache, class_name, bbox, signature):
+        """Find the cached signature for the same stationary object."""
+        for key, entry in cache.items():
+            if entry["class"] != class_name:
+                continue
+            if iou(entry["bbox"], bbox) < self.iou_threshold:
+                continue
+            if hamming(entry["hash"], signature) > self.hamming_threshold:
+                continue
+            return key
+        return None
+
+    def filter(self, frame, camera_name, objects, now=None):
+        """Update the cache with `objects` and return those that are not stationary."""
+        if not self.enabled or not objects:
+            return objects
+
+        now = now or time.time()
+        with self.lock:
+            cache = self.caches.setdefault(camera_name, OrderedDict())
+
+            # Expire signatures not seen within the TTL
+            while cache:
+                key, entry = next(iter(cache.items()))
+                if now - entry["last_seen"] <= self.ttl:
+                    break
+                cache.popitem(last=False)
+
+            moving = []
+            for obj in objects:
+                x1, y1, x2, y2 = [int(v) for v in obj["bbox"]]
+                crop = frame[max(0, y1):max(0, y2), max(0, x1):max(0, x2)]
+                if crop.size == 0:
+                    moving.append(obj)
+                    continue
+
+                signature = dhash(crop)
+                key = self._match(cache, obj["class"], obj["bbox"], signature)
+
+                if key is None:
+                    key = (obj["class"], x1, y1, x2, y2, now)
+                    cache[key] = {
+                        "class": obj["class"],
+                        "bbox": [x1, y1, x2, y2],
+                        "hash": signature,
+                        "first_seen": now,
+                        "last_seen": now,
+                        "reported": False,
+                    }
+                    moving.append(obj)
+                else:
+                    entry = cache[key]
+                    entry["last_seen"] = now
+                    entry["hash"] = signature
+                    cache.move_to_end(key)
+                    if not entry["reported"] or now - entry["first_seen"] < self.min_stationary:
+                        moving.append(obj)
+
+                # Evict least recently seen signatures beyond the memory cap
+                while len(cache) > self.max_entries:
+                    cache.popitem(last=False)
+
+            return moving
+
+    def mark_reported(self, camera_name, objects):
+        """Flag the signatures of objects in a saved event so later repeats can be suppressed."""
+        if not self.enabled:
+            return
+        with self.lock:
+            cache = self.caches.get(camera_name, {})
+            for obj in objects:
+                bbox = [int(v) for v in obj["bbox"]]
+                for entry in cache.values():
+                    if entry["class"] == obj["class"] and iou(entry["bbox"], bbox) >= self.iou_threshold:
+                        entry["reported"] = True
+                        break
+
+    def record_suppressed(self, camera_name, detection_type):
+        """Count an event that was suppressed as a static duplicate."""
+        key = f"{camera_name}_{detection_type}"
+        with self.lock:
+            self.suppressed[key] = self.suppressed.get(key, 0) + 1
+            self.suppressed_total[key] = self.suppressed_total.get(key, 0) + 1
+            total = self.suppressed_total[key]
+        if total == 1 or total % 100 == 0:
+            logger.info(f"Suppressed {total} static {detection_type} events on {camera_name}")
+
+    def pop_suppressed(self, camera_name, detection_type):
+        """Return and reset the suppressed count since the last saved event."""
+        key = f"{camera_name}_{detection_type}"
+        with self.lock:
+            return self.suppressed.pop(key, 0)
+
+    def stats(self):
+        """Cache sizes and suppressed totals for reporting."""
+        with self.lock:
+            return {
+                "cached_signatures": {camera: len(cache) for camera, cache in self.caches.items()},
+                "suppressed_total": dict(self.suppressed_total),
+            }
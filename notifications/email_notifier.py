@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import os
+import sys
 import json
 import logging
 import smtplib
@@ -8,15 +9,11 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
 from pathlib import Path
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("logs/email_notifier.log"),
-        logging.StreamHandler()
-    ]
-)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.log_pipeline import setup_logging
+
+# Configure logging: rate-limited, written by a background thread
+setup_logging("logs/email_notifier.log", config_path="config/system.json")
 logger = logging.getLogger("EmailNotifier")
 
 class EmailNotifier:
@@ -67,6 +64,12 @@ class EmailNotifier:
             image_path = event_data.get('image_path')
             objects = event_data.get('objects', [])
             
+            # Correlated incidents carry one image per camera
+            incident = event_data.get('incident')
+            image_paths = [p for p in [image_path] + event_data.get('image_paths', []) if p and os.path.exists(p)]
+            if incident:
+                camera = f"{incident['group']} ({', '.join(incident['cameras'])})"
+            
             # Create email subject
             subject = f"CCTV Alert: {event_type.capitalize()} detected on {camera}"
             
@@ -80,8 +83,8 @@ class EmailNotifier:
                 <p><strong>Time:</strong> {timestamp}</p>
                 <p><strong>Objects Detected:</strong> {len(objects)}</p>
                 <div>
-                    <p>Detection Image:</p>
-                    <img src="cid:detection_image" style="max-width: 100%; height: auto;" />
+                    <p>Detection Image{'s' if len(image_paths) > 1 else ''}:</p>
+                    {''.join(f'<img src="cid:detection_image_{i}" style="max-width: 100%; height: auto;" />' for i in range(len(image_paths)))}
                 </div>
                 <p>
                     <em>This is an automated notification from your CCTV Intelligence System.</em>
@@ -99,13 +102,13 @@ class EmailNotifier:
             # Attach HTML body
             msg.attach(MIMEText(html_body, 'html'))
             
-            # Attach image if available
-            if image_path and os.path.exists(image_path):
-                with open(image_path, 'rb') as img_file:
+            # Attach images if available
+            for i, path in enumerate(image_paths):
+                with open(path, 'rb') as img_file:
                     img_data = img_file.read()
                     image = MIMEImage(img_data)
-                    image.add_header('Content-ID', '<detection_image>')
-                    image.add_header('Content-Disposition', 'inline', filename=os.path.basename(image_path))
+                    image.add_header('Content-ID', f'<detection_image_{i}>')
+                    image.add_header('Content-Disposition', 'inline', filename=os.path.basename(path))
                     msg.attach(image)
             
             # Connect to SMTP server
@@ -0,0 +1,51 @@
+#!/bin/bash
+
+# Run a coordinator and several analyzer nodes on this machine.
+# Usage: ./run_cluster.sh [number of nodes]
+
+# Activate virtual environment
+source ~/cctv-system/venv/bin/activate
+
+# Navigate to cctv-system directory
+cd ~/cctv-system
+
+# Create required directories
+mkdir -p logs
+mkdir -p events
+
+NODES=${1:-2}
+PORT=$(python -c "import json; print(json.load(open('config/system.json')).get('cluster', {}).get('port', 9000))")
+PIDS=()
+
+# Start the coordinator, which writes events to the central events directory
+python coordinator/coordinator.py --config config/system.json --events-dir events &
+PIDS+=($!)
+sleep 1
+
+# Start the analyzer nodes
+for i in $(seq 1 $NODES); do
+    python detector/camera_analyzer.py --config config/system.json \
+        --coordinator http://127.0.0.1:$PORT --node-id node$i &
+    PIDS+=($!)
+done
+
+# Start the web interface, which reads the central events directory
+cd webui
+gunicorn -c gunicorn.conf.py wsgi:application &
+PIDS+=($!)
+
+# Function to handle script termination
+function cleanup {
+    echo "Stopping processes..."
+    kill ${PIDS[@]}
+    wait
+    echo "Cluster stopped"
+    exit
+}
+
+# Set up signal handling
+trap cleanup SIGINT SIGTERM
+
+# Wait for processes
+echo "Cluster running with $NODES nodes (status: http://127.0.0.1:$PORT/status). Press Ctrl+C to stop."
+wait
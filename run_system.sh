@@ -14,9 +14,25 @@ mkdir -p events
 python detector/camera_analyzer.py --config config/system.json &
 ANALYZER_PID=$!
 
-# Start the web interface
+# Wait for the analyzer to report readiness (model warm, cameras opened)
+READY_FILE=logs/analyzer.ready
+for i in $(seq 1 120); do
+    if [ -f "$READY_FILE" ] || ! kill -0 $ANALYZER_PID 2>/dev/null; then
+        break
+    fi
+    sleep 1
+done
+if [ -f "$READY_FILE" ]; then
+    echo "Camera analyzer startup:"
+    cat "$READY_FILE"
+    echo
+else
+    echo "Camera analyzer did not report readiness"
+fi
+
+# Start the web interface with the production WSGI server
 cd webui
-python app.py &
+gunicorn -c gunicorn.conf.py wsgi:application &
 WEBUI_PID=$!
 
 # Function to handle script termination
@@ -6,5 +6,9 @@ source ~/cctv-system/venv/bin/activate
 # Navigate to webui directory
 cd ~/cctv-system/webui
 
-# Run the web interface
-python app.py
+# Run the web interface (use --dev for the Flask development server)
+if [ "$1" == "--dev" ]; then
+    python app.py
+else
+    gunicorn -c gunicorn.conf.py wsgi:application
+fi
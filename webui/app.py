@@ -1,35 +1,49 @@
 #!/usr/bin/env python3
 import os
+import sys
+import copy
+import signal
 import json
 import logging
+import threading
 import datetime
 from pathlib import Path
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, jsonify, send_from_directory
 from flask_login import LoginManager, UserMixin, login_required, login_user, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
+from event_index import EventIndex
+from event_export import build_members, archive_etag, tar_length, stream_tar, stream_zip
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("../logs/webui.log"),
-        logging.StreamHandler()
-    ]
-)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.log_pipeline import setup_logging
+
+# Configure logging: rate-limited, written by a background thread
+setup_logging("../logs/webui.log", config_path="../config/system.json")
 logger = logging.getLogger("WebUI")
 
 # Initialize Flask app
 app = Flask(__name__)
-app.config['SECRET_KEY'] = os.urandom(24).hex()  # Generate a random secret key
+# Use a fixed key when provided so sessions are valid across WSGI workers
+app.config['SECRET_KEY'] = os.environ.get('CCTV_SECRET_KEY') or os.urandom(24).hex()
 app.config['EVENTS_DIR'] = '../events'
 app.config['CONFIG_FILE'] = '../config/system.json'
 
+# Event images are never rewritten, so browsers may cache them for a year.
+# They are only cached privately since they are behind a login.
+app.config['EVENT_IMAGE_MAX_AGE'] = 365 * 24 * 3600
+app.config['USE_X_SENDFILE'] = os.environ.get('CCTV_X_SENDFILE') == '1'
+
 # Initialize Flask-Login
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+# Incrementally maintained event index shared by all requests. It is built
+# here so gunicorn workers (preload_app) inherit it instead of each scanning
+# the whole archive.
+event_index = EventIndex(app.config['EVENTS_DIR'])
+event_index.refresh()
+
 # User class for authentication
 class User(UserMixin):
     def __init__(self, id, username, password_hash):
@@ -40,11 +54,28 @@ class User(UserMixin):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+# Parsed config cache, invalidated by file mtime/size or by save_config
+config_cache = {"key": None, "config": None}
+config_cache_lock = threading.Lock()
+
+# Hash of the default password, computed once instead of on every request
+default_password_hash = None
+
+def config_file_key():
+    stat = os.stat(app.config['CONFIG_FILE'])
+    return (stat.st_mtime_ns, stat.st_size)
+
 # Load system configuration
 def load_config():
     try:
-        with open(app.config['CONFIG_FILE'], 'r') as f:
-            return json.load(f)
+        key = config_file_key()
+        with config_cache_lock:
+            if config_cache["key"] != key:
+                with open(app.config['CONFIG_FILE'], 'r') as f:
+                    config_cache["config"] = json.load(f)
+                config_cache["key"] = key
+            # Callers modify the returned config before saving it
+            return copy.deepcopy(config_cache["config"])
     except Exception as e:
         logger.error(f"Error loading config: {e}")
         return {
@@ -63,8 +94,11 @@ def load_config():
 # Save system configuration
 def save_config(config):
     try:
-        with open(app.config['CONFIG_FILE'], 'w') as f:
-            json.dump(config, f, indent=2)
+        with config_cache_lock:
+            with open(app.config['CONFIG_FILE'], 'w') as f:
+                json.dump(config, f, indent=2)
+            config_cache["config"] = copy.deepcopy(config)
+            config_cache["key"] = config_file_key()
         return True
     except Exception as e:
         logger.error(f"Error saving config: {e}")
@@ -73,6 +107,7 @@ def save_config(config):
 # Load user from config
 @login_manager.user_loader
 def load_user(user_id):
+    global default_password_hash
     if user_id != '1':  # We only have one user for now
         return None
         
@@ -83,10 +118,20 @@ def load_user(user_id):
     
     # If no password hash exists, use default password
     if not password_hash:
-        password_hash = generate_password_hash('admin')
+        if default_password_hash is None:
+            default_password_hash = generate_password_hash('admin')
+        password_hash = default_password_hash
         
     return User('1', username, password_hash)
 
+# Add the web image path used by the templates
+def add_web_image_path(event_data):
+    if 'image_path' in event_data:
+        image_name = os.path.basename(event_data['image_path'])
+        event_data['web_image_path'] = f'/events/{image_name}'
+    event_data['web_image_paths'] = [f'/events/{os.path.basename(p)}' for p in event_data.get('image_paths', [])]
+    return event_data
+
 # Routes
 @app.route('/')
 @login_required
@@ -96,29 +141,14 @@ def index():
     cameras = config.get('cameras', [])
     
     # Get recent events
-    events = []
-    events_dir = Path(app.config['EVENTS_DIR'])
-    if events_dir.exists():
-        event_files = list(events_dir.glob("*.json"))
-        event_files.sort(key=os.path.getmtime, reverse=True)
-        
-        # Load the 10 most recent events
-        for event_file in event_files[:10]:
-            try:
-                with open(event_file, 'r') as f:
-                    event_data = json.load(f)
-                    # Fix image path for web display
-                    if 'image_path' in event_data:
-                        image_name = os.path.basename(event_data['image_path'])
-                        event_data['web_image_path'] = f'/events/{image_name}'
-                    events.append(event_data)
-            except Exception as e:
-                logger.error(f"Error loading event file {event_file}: {e}")
+    events = [add_web_image_path(e) for e in event_index.page(start=0, end=10)]
     
     return render_template('index.html', 
                            cameras=cameras, 
                            events=events, 
-                           config=config)
+                           config=config,
+                           total_events=event_index.count(),
+                           histogram=event_index.hourly_histogram())
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -160,6 +190,8 @@ def camera_add():
         name = request.form.get('name')
         url = request.form.get('url')
         fps = int(request.form.get('fps', 5))
+        model = request.form.get('model', '').strip()
+        input_size = request.form.get('input_size', '').strip()
         
         # Get detections
         detections = []
@@ -183,6 +215,12 @@ def camera_add():
             "detections": detections
         }
         
+        # Cameras without a model use the analyzer's default
+        if model:
+            camera["model"] = model
+        if input_size:
+            camera["input_size"] = int(input_size)
+        
         # Load current config
         config = load_config()
         if 'cameras' not in config:
@@ -239,45 +277,15 @@ def events_page():
     camera = request.args.get('camera', None)
     event_type = request.args.get('type', None)
     
-    # Get events
-    events = []
-    events_dir = Path(app.config['EVENTS_DIR'])
-    if events_dir.exists():
-        event_files = list(events_dir.glob("*.json"))
-        event_files.sort(key=os.path.getmtime, reverse=True)
-        
-        # Filter events
-        filtered_events = []
-        for event_file in event_files:
-            try:
-                with open(event_file, 'r') as f:
-                    event_data = json.load(f)
-                    
-                    # Apply filters
-                    if camera and event_data.get('camera') != camera:
-                        continue
-                    if event_type and event_data.get('type') != event_type:
-                        continue
-                        
-                    # Fix image path for web display
-                    if 'image_path' in event_data:
-                        image_name = os.path.basename(event_data['image_path'])
-                        event_data['web_image_path'] = f'/events/{image_name}'
-                        
-                    filtered_events.append(event_data)
-            except Exception as e:
-                logger.error(f"Error loading event file {event_file}: {e}")
-                
-        # Paginate
-        start = (page - 1) * per_page
-        end = start + per_page
-        events = filtered_events[start:end]
-        total_pages = (len(filtered_events) + per_page - 1) // per_page
-        
-        # Get camera and event type lists for filtering
-        config = load_config()
-        cameras = [camera.get('name') for camera in config.get('cameras', [])]
-        event_types = list(set(event.get('type') for event in filtered_events if 'type' in event))
+    # Get the requested page of events from the index
+    start = (page - 1) * per_page
+    end = start + per_page
+    events = [add_web_image_path(e) for e in event_index.page(camera, event_type, start, end)]
+    total_pages = (event_index.count(camera, event_type) + per_page - 1) // per_page
+    
+    # Get camera and event type lists for filtering
+    cameras = event_index.cameras()
+    event_types = event_index.event_types()
         
     return render_template('events.html', 
                            events=events,
@@ -292,7 +300,12 @@ def events_page():
 @login_required
 def event_image(filename):
     """Serve event images."""
-    return send_from_directory(app.config['EVENTS_DIR'], filename)
+    response = send_from_directory(app.config['EVENTS_DIR'], filename,
+                                   max_age=app.config['EVENT_IMAGE_MAX_AGE'])
+    # Keep snapshots out of shared proxy caches
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
 
 @app.route('/settings')
 @login_required
@@ -370,6 +383,148 @@ def settings_save():
         
     return redirect(url_for('settings'))
 
+# Parse an optional ISO date/time query argument
+def parse_time_arg(value):
+    """Parse an ISO 8601 time as naive local time, matching event timestamps."""
+    if not value:
+        return None
+    # fromisoformat only accepts a "Z" suffix from Python 3.11
+    if value.endswith(('Z', 'z')):
+        value = value[:-1] + '+00:00'
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+@app.route('/api/events/stats')
+@login_required
+def api_events_stats():
+    """API endpoint with stored event counts per day, camera and type."""
+    return jsonify({
+        "status": "success",
+        "total": event_index.count(),
+        "daily": [{"day": day, "count": count} for day, count in event_index.daily_counts()],
+        "cameras": {camera: event_index.count(camera=camera) for camera in event_index.cameras()},
+        "types": {event_type: event_index.count(event_type=event_type) for event_type in event_index.event_types()}
+    })
+
+@app.route('/api/events/export')
+@login_required
+def api_events_export():
+    """API endpoint to stream an archive of matching events."""
+    camera = request.args.get('camera') or None
+    event_type = request.args.get('type') or None
+    archive_format = request.args.get('format', 'tar')
+    
+    if archive_format not in ('tar', 'zip'):
+        return jsonify({"status": "error", "message": f"Unsupported format: {archive_format}"}), 400
+    try:
+        start = parse_time_arg(request.args.get('start'))
+        end = parse_time_arg(request.args.get('end'))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid time range: {e}"}), 400
+        
+    # Resolve matching files; sizes are fixed here so the archive length is known
+    names = event_index.select(camera, event_type, start, end)
+    members = build_members(app.config['EVENTS_DIR'], names)
+    etag = archive_etag(members, archive_format)
+    
+    # Throttle reads so exports do not starve the analyzer's event writes
+    config = load_config()
+    rate_limit_mb = config.get('web_interface', {}).get('export_rate_limit_mb', 20)
+    rate_limit = rate_limit_mb * 1024 * 1024 if rate_limit_mb else None
+    
+    headers = {
+        "Content-Disposition": f'attachment; filename="events_{etag[:12]}.{archive_format}"',
+        "ETag": f'"{etag}"',
+        "Cache-Control": "no-store"
+    }
+    
+    # ZIP needs CRCs of every file in its trailer, so it is streamed without ranges
+    if archive_format == 'zip':
+        headers["Accept-Ranges"] = "none"
+        return Response(stream_zip(members, rate_limit), headers=headers,
+                        mimetype='application/zip', direct_passthrough=True)
+        
+    length = tar_length(members)
+    headers["Accept-Ranges"] = "bytes"
+    status = 200
+    range_start, range_end = 0, length
+    
+    # Only resume if the archive contents have not changed since the first request
+    byte_range = request.range
+    if_range = request.if_range
+    if byte_range and (if_range.etag or if_range.date) and if_range.etag != etag:
+        byte_range = None
+        
+    if byte_range:
+        bounds = byte_range.range_for_length(length)
+        if bounds is None:
+            headers["Content-Range"] = f"bytes */{length}"
+            return Response(status=416, headers=headers)
+        range_start, range_end = bounds
+        headers["Content-Range"] = f"bytes {range_start}-{range_end - 1}/{length}"
+        status = 206
+        
+    headers["Content-Length"] = str(range_end - range_start)
+    logger.info(f"Exporting {len(names)} events ({length} bytes, range {range_start}-{range_end})")
+    
+    return Response(stream_tar(members, range_start, range_end, rate_limit), status=status,
+                    headers=headers, mimetype='application/x-tar', direct_passthrough=True)
+
+@app.route('/api/profile', methods=['POST'])
+@login_required
+def api_profile():
+    """API endpoint to start a time-bounded profile of the running analyzer."""
+    data = request.get_json(silent=True) or request.form
+    mode = data.get('mode', 'stages')
+    if mode not in ('stages', 'sampling'):
+        return jsonify({"status": "error", "message": f"Unknown profiling mode: {mode}"}), 400
+    try:
+        duration = min(float(data.get('duration', 30)), 600)
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "Invalid duration"}), 400
+        
+    config = load_config()
+    ready_file = os.path.join('..', config.get('startup', {}).get('ready_file', 'logs/analyzer.ready'))
+    profiling_config = config.get('profiling', {})
+    request_file = os.path.join('..', profiling_config.get('request_file', 'logs/profile_request.json'))
+    
+    try:
+        # The analyzer records its PID in the readiness file
+        with open(ready_file, 'r') as f:
+            pid = json.load(f)['pid']
+        with open(request_file, 'w') as f:
+            json.dump({"mode": mode, "duration": duration}, f)
+        os.kill(pid, signal.SIGUSR1)
+    except Exception as e:
+        logger.error(f"Error starting analyzer profile: {e}")
+        return jsonify({"status": "error", "message": f"Could not signal analyzer: {e}"}), 503
+        
+    output_dir = profiling_config.get('output_dir', 'logs/profiles')
+    return jsonify({"status": "success",
+                    "message": f"Started {mode} profile for {duration:.0f}s, output in {output_dir}"})
+
+@app.route('/api/profile', methods=['GET'])
+@login_required
+def api_profile_results():
+    """API endpoint listing recent profile summaries."""
+    config = load_config()
+    output_dir = Path('..') / config.get('profiling', {}).get('output_dir', 'logs/profiles')
+    
+    profiles = []
+    if output_dir.exists():
+        for summary_file in sorted(output_dir.glob("*_summary.json"), reverse=True)[:10]:
+            try:
+                with open(summary_file, 'r') as f:
+                    summary = json.load(f)
+                summary['name'] = summary_file.name[:-len("_summary.json")]
+                profiles.append(summary)
+            except Exception as e:
+                logger.error(f"Error loading profile summary {summary_file}: {e}")
+                
+    return jsonify({"status": "success", "profiles": profiles})
+
 @app.route('/api/restart', methods=['POST'])
 @login_required
 def api_restart():
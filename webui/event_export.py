@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+import os
+import io
+import json
+import time
+import queue
+import hashlib
+import logging
+import tarfile
+import zipfile
+import threading
+from pathlib import Path
+
+logger = logging.getLogger("EventExport")
+
+BLOCK_SIZE = tarfile.BLOCKSIZE
+CHUNK_SIZE = 256 * 1024
+
+class ExportMember:
+    """One file in an export archive, sized at build time."""
+
+    def __init__(self, arcname, path, size, mtime):
+        self.arcname = arcname
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.header = None
+
+    @property
+    def padded_size(self):
+        return (self.size + BLOCK_SIZE - 1) // BLOCK_SIZE * BLOCK_SIZE
+
+def build_members(events_dir, names):
+    """Collect metadata, image and clip files for the given event files."""
+    events_dir = Path(events_dir)
+    members = []
+    seen = set()
+
+    def add(path, arcname):
+        if arcname in seen:
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        seen.add(arcname)
+        members.append(ExportMember(arcname, str(path), stat.st_size, int(stat.st_mtime)))
+
+    for name in names:
+        event_path = events_dir / name
+        try:
+            with open(event_path, 'r') as f:
+                event_data = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading event file {name}: {e}")
+            continue
+
+        add(event_path, f"events/{name}")
+
+        # Images and clips are referenced relative to the analyzer's working
+        # directory, so look them up by basename in the events directory
+        media = []
+        if event_data.get('image_path'):
+            media.append(event_data['image_path'])
+        media.extend(event_data.get('image_paths', []))
+        if event_data.get('clip_path'):
+            media.append(event_data['clip_path'])
+        clip = event_path.with_suffix(".mp4")
+        if clip.exists():
+            media.append(str(clip))
+
+        for media_path in media:
+            media_name = os.path.basename(media_path)
+            add(events_dir / media_name, f"events/{media_name}")
+
+    return members
+
+def archive_etag(members, archive_format):
+    """Stable identifier of an archive's contents, used for If-Range."""
+    digest = hashlib.sha1(archive_format.encode())
+    for member in members:
+        digest.update(f"{member.arcname}\0{member.size}\0{member.mtime}\n".encode())
+    return digest.hexdigest()
+
+def tar_length(members):
+    """Exact byte length of the tar stream produced by stream_tar."""
+    total = 2 * BLOCK_SIZE
+    for member in members:
+        if member.header is None:
+            info = tarfile.TarInfo(member.arcname)
+            info.size = member.size
+            info.mtime = member.mtime
+            info.mode = 0o644
+            member.header = info.tobuf(format=tarfile.GNU_FORMAT)
+        total += len(member.header) + member.padded_size
+    return total
+
+def read_file(path, size, offset=0, rate_limit=None):
+    """Yield exactly `size - offset` bytes of a file in chunks.
+
+    Short files are zero padded so the precomputed archive length stays
+    valid. Pages are dropped from the cache after reading so a large export
+    does not evict the analyzer's working set, and an optional byte rate
+    limit keeps the disk available for event writes.
+    """
+    remaining = size - offset
+    try:
+        f = open(path, 'rb')
+    except OSError as e:
+        logger.error(f"Error opening {path} for export: {e}")
+        f = None
+
+    try:
+        if f is not None:
+            f.seek(offset)
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), offset, 0, os.POSIX_FADV_SEQUENTIAL)
+        position = offset
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining)) if f is not None else b""
+            if not chunk:
+                chunk = bytes(min(CHUNK_SIZE, remaining))
+            elif f is not None and hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), position, len(chunk), os.POSIX_FADV_DONTNEED)
+            position += len(chunk)
+            remaining -= len(chunk)
+            yield chunk
+            if rate_limit:
+                time.sleep(len(chunk) / rate_limit)
+    finally:
+        if f is not None:
+            f.close()
+
+def stream_tar(members, start=0, end=None, rate_limit=None):
+    """Yield bytes [start, end) of the tar archive of the given members.
+
+    Members entirely before `start` are skipped without being read, which
+    makes resuming an interrupted download cheap.
+    """
+    total = tar_length(members)
+    end = total if end is None else min(end, total)
+
+    def pieces():
+        for member in members:
+            yield ("bytes", member.header)
+            yield ("file", member)
+            padding = member.padded_size - member.size
+            if padding:
+                yield ("bytes", bytes(padding))
+        yield ("bytes", bytes(2 * BLOCK_SIZE))
+
+    position = 0
+    for kind, piece in pieces():
+        length = piece.size if kind == "file" else len(piece)
+        piece_start, piece_end = position, position + length
+        position = piece_end
+        if piece_end <= start:
+            continue
+        if piece_start >= end:
+            break
+
+        lo = max(start, piece_start) - piece_start
+        hi = min(end, piece_end) - piece_start
+        if kind == "bytes":
+            yield piece[lo:hi]
+        else:
+            sent = 0
+            for chunk in read_file(piece.path, piece.size, lo, rate_limit):
+                chunk = chunk[:hi - lo - sent]
+                if chunk:
+                    yield chunk
+                sent += len(chunk)
+                if sent >= hi - lo:
+                    break
+
+class _QueueWriter(io.RawIOBase):
+    """Unseekable file object that hands written bytes to a queue."""
+
+    def __init__(self, q):
+        self.q = q
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.q.put(bytes(b))
+        return len(b)
+
+def stream_zip(members, rate_limit=None):
+    """Yield a ZIP archive of the given members without buffering it.
+
+    Files are stored uncompressed since JPEGs and clips are already
+    compressed. The archive is built in a worker thread writing into a
+    bounded queue, so at most a few chunks are held in memory.
+    """
+    q = queue.Queue(maxsize=8)
+    done = object()
+    cancelled = threading.Event()
+
+    def build():
+        try:
+            with zipfile.ZipFile(_QueueWriter(q), 'w', zipfile.ZIP_STORED, allowZip64=True) as zf:
+                for member in members:
+                    if cancelled.is_set():
+                        return
+                    info = zipfile.ZipInfo(member.arcname, time.localtime(member.mtime)[:6])
+                    info.file_size = member.size
+                    with zf.open(info, 'w', force_zip64=member.size > 0x7FFFFFFF) as dest:
+                        for chunk in read_file(member.path, member.size, rate_limit=rate_limit):
+                            if cancelled.is_set():
+                                return
+                            dest.write(chunk)
+        except Exception as e:
+            logger.error(f"Error building export archive: {e}")
+        finally:
+            q.put(done)
+
+    worker = threading.Thread(target=build, daemon=True)
+    worker.start()
+    try:
+        while True:
+            chunk = q.get()
+            if chunk is done:
+                break
+            yield chunk
+    finally:
+        # Client went away: stop the writer and drain so it can exit
+        cancelled.set()
+        while worker.is_alive():
+            try:
+                q.get(timeout=0.1)
+            except queue.Empty:
+                pass
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta
+from collections import Counter
+
+logger = logging.getLogger("EventIndex")
+
+class EventIndex:
+    """In-memory index of event metadata with incrementally maintained aggregates.
+
+    The events directory is only rescanned when its mtime changes, and only
+    newly added files are parsed, so filter facets, counts and histograms are
+    served from counters instead of reading every event file per request.
+    """
+
+    def __init__(self, events_dir, min_refresh_seconds=1.0):
+        self.events_dir = Path(events_dir)
+        self.min_refresh = min_refresh_seconds
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.dir_mtime = None
+        self.last_refresh = 0.0
+        self.entries = {}
+        self.pending = set()
+
+        # Ordered (newest first) event names per filter key
+        self.ordered = {}
+
+        # Aggregates
+        self.camera_counts = Counter()
+        self.type_counts = Counter()
+        self.pair_counts = Counter()
+        self.day_counts = Counter()
+        self.hour_counts = Counter()
+
+    @staticmethod
+    def filter_keys(cameras, event_type):
+        """Return every filter key an event with these cameras/type belongs to."""
+        keys = [(None, None), (None, event_type)]
+        for camera in cameras:
+            keys.extend([(camera, None), (camera, event_type)])
+        return keys
+
+    def refresh(self):
+        """Pick up added and removed event files since the last refresh.
+
+        The directory is listed and new files are parsed outside the index
+        lock by one thread at a time, so other requests keep being served from
+        the current aggregates meanwhile. Rescans run at most once every
+        `min_refresh_seconds`.
+        """
+        try:
+            dir_mtime = os.stat(self.events_dir).st_mtime_ns
+        except OSError:
+            return
+
+        now = time.monotonic()
+        with self.lock:
+            # Nothing changed on disk and no half-written files to retry
+            if dir_mtime == self.dir_mtime and not self.pending:
+                return
+            built = self.dir_mtime is not None
+            if built and now - self.last_refresh < self.min_refresh:
+                return
+
+        # Once built, skip the refresh if another thread is already doing it
+        if not self.refresh_lock.acquire(blocking=not built):
+            return
+        try:
+            self._refresh(dir_mtime, now)
+        finally:
+            self.refresh_lock.release()
+
+    def _refresh(self, dir_mtime, now):
+        with self.lock:
+            scan = dir_mtime != self.dir_mtime
+            pending = set(self.pending)
+
+        if scan:
+            with os.scandir(self.events_dir) as it:
+                names = {entry.name: entry.inode() for entry in it if entry.name.endswith(".json") and entry.is_file()}
+            with self.lock:
+                # A file replaced under the same name (e.g. an incident gaining
+                # cameras) has a new inode and is parsed again
+                for name in [name for name, entry in self.entries.items() if names.get(name) != entry["inode"]]:
+                    self._remove(name)
+                self.pending.intersection_update(names)
+                new_names = [name for name in names if name not in self.entries]
+        else:
+            new_names = list(pending)
+
+        loaded = []
+        for name in new_names:
+            try:
+                stat = os.stat(self.events_dir / name)
+            except OSError:
+                # Deleted since the scan
+                loaded.append((name, None, None))
+                continue
+            try:
+                with open(self.events_dir / name, 'r') as f:
+                    event_data = json.load(f)
+            except Exception:
+                # The analyzer may still be writing this file; retry next refresh
+                event_data = None
+            loaded.append((name, event_data, stat))
+
+        with self.lock:
+            for name, event_data, stat in loaded:
+                if event_data is not None and name not in self.entries:
+                    self.pending.discard(name)
+                    self._add(name, event_data, stat.st_mtime, stat.st_ino)
+                elif stat is None:
+                    self.pending.discard(name)
+                else:
+                    self.pending.add(name)
+            self.dir_mtime = dir_mtime
+            self.last_refresh = now
+
+    def _add(self, name, event_data, mtime, inode=None):
+        """Fold one parsed event file into the aggregates."""
+        camera = event_data.get('camera')
+        # Correlated incidents are listed under every camera that saw them
+        cameras = event_data.get('incident', {}).get('cameras') or [camera]
+        event_type = event_data.get('type')
+        try:
+            when = datetime.strptime(event_data.get('timestamp', ''), "%Y%m%d_%H%M%S")
+        except (TypeError, ValueError):
+            when = datetime.fromtimestamp(mtime)
+
+        entry = {
+            "cameras": cameras,
+            "type": event_type,
+            "sort_key": (-mtime, name),
+            "inode": inode,
+            "time": when,
+            "day": when.strftime("%Y-%m-%d"),
+            "hour": when.strftime("%Y-%m-%d %H"),
+        }
+        self.entries[name] = entry
+
+        for key in self.filter_keys(cameras, event_type):
+            bisect.insort(self.ordered.setdefault(key, []), entry["sort_key"])
+
+        for camera in cameras:
+            self.camera_counts[camera] += 1
+            self.pair_counts[(camera, event_type)] += 1
+        self.type_counts[event_type] += 1
+        self.day_counts[entry["day"]] += 1
+        self.hour_counts[entry["hour"]] += 1
+
+    def _remove(self, name):
+        """Drop a deleted event file from the index and aggregates."""
+        entry = self.entries.pop(name)
+        cameras = entry["cameras"]
+        event_type = entry["type"]
+
+        for key in self.filter_keys(cameras, event_type):
+            ordered = self.ordered.get(key, [])
+            i = bisect.bisect_left(ordered, entry["sort_key"])
+            if i < len(ordered) and ordered[i] == entry["sort_key"]:
+                del ordered[i]
+
+        counted = [(self.type_counts, event_type), (self.day_counts, entry["day"]), (self.hour_counts, entry["hour"])]
+        for camera in cameras:
+            counted.extend([(self.camera_counts, camera), (self.pair_counts, (camera, event_type))])
+        for counter, key in counted:
+            counter[key] -= 1
+            if counter[key] <= 0:
+                del counter[key]
+
+    def count(self, camera=None, event_type=None):
+        """Number of events matching the filters."""
+        self.refresh()
+        if camera and event_type:
+            return self.pair_counts.get((camera, event_type), 0)
+        if camera:
+            return self.camera_counts.get(camera, 0)
+        if event_type:
+            return self.type_counts.get(event_type, 0)
+        return len(self.entries)
+
+    def page(self, camera=None, event_type=None, start=0, end=10):
+        """Load event data for a slice of the filtered, newest-first events."""
+        self.refresh()
+        with self.lock:
+            ordered = self.ordered.get((camera or None, event_type or None), [])
+            names = [name for _, name in ordered[start:end]]
+
+        events = []
+        for name in names:
+            try:
+                with open(self.events_dir / name, 'r') as f:
+                    events.append(json.load(f))
+            except Exception as e:
+                logger.error(f"Error loading event file {name}: {e}")
+        return events
+
+    def cameras(self):
+        """Cameras that have at least one event."""
+        self.refresh()
+        return sorted(c for c in self.camera_counts if c is not None)
+
+    def event_types(self):
+        """Detection types that have at least one event."""
+        self.refresh()
+        return sorted(t for t in self.type_counts if t is not None)
+
+    def hourly_histogram(self, hours=24, now=None):
+        """Event counts for each of the last `hours` hours, oldest first."""
+        self.refresh()
+        now = now or datetime.now()
+        histogram = []
+        for offset in range(hours - 1, -1, -1):
+            hour = now - timedelta(hours=offset)
+            key = hour.strftime("%Y-%m-%d %H")
+            histogram.append({"hour": hour.strftime("%H:00"), "count": self.hour_counts.get(key, 0)})
+        return histogram
+
+    def daily_counts(self):
+        """Event counts per day, oldest first."""
+        self.refresh()
+        return sorted(self.day_counts.items())
+
+    def select(self, camera=None, event_type=None, start=None, end=None):
+        """Names of events matching the filters and time range, oldest first."""
+        self.refresh()
+        with self.lock:
+            ordered = self.ordered.get((camera or None, event_type or None), [])
+            names = []
+            for _, name in reversed(ordered):
+                when = self.entries[name]["time"]
+                if start and when < start:
+                    continue
+                if end and when > end:
+                    continue
+                names.append(name)
+        return names
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+# Gunicorn settings for the web interface
+import os
+import json
+import multiprocessing
+
+# Listen on the port configured in the web interface settings
+try:
+    with open('../config/system.json', 'r') as f:
+        port = json.load(f).get('web_interface', {}).get('port', 8080)
+except Exception:
+    port = 8080
+
+bind = f"0.0.0.0:{port}"
+
+# Several workers with a few threads each keep event browsing responsive
+# while multiple operators are using the UI
+workers = int(os.environ.get('CCTV_WEB_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.environ.get('CCTV_WEB_THREADS', 4))
+worker_class = 'gthread'
+timeout = 60
+
+# Load the app before forking so all workers share the same secret key
+# and the event index built at import
+preload_app = True
+
+accesslog = '../logs/webui_access.log'
+errorlog = '../logs/webui_error.log'
@@ -0,0 +1,7 @@
+#!/usr/bin/env python3
+"""WSGI entry point for serving the web interface with a production server.
+
+Run from the webui directory, e.g.:
+    gunicorn -c gunicorn.conf.py wsgi:application
+"""
+from app import app as application